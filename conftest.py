@@ -0,0 +1,10 @@
+import pytest
+
+from core.test_runner import isolated_caches
+
+
+@pytest.fixture(scope='session', autouse=True)
+def isolated_cache():
+    """Тесты pytest очищают кэш, поэтому получают свой файл кэша."""
+    with isolated_caches():
+        yield
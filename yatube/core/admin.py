@@ -0,0 +1,14 @@
+from django.contrib import admin
+
+from .models import Task
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'state', 'priority', 'attempts',
+                    'run_after', 'created')
+    list_filter = ('state', 'priority')
+    search_fields = ('name',)
+    readonly_fields = ('last_error',)
+
+
+admin.site.register(Task, TaskAdmin)
@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .metrics import registry
+        from .tasks import queue_depth
+
+        registry.register_gauge(
+            'yatube_task_queue_depth', queue_depth, shared=True
+        )
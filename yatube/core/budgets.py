@@ -0,0 +1,26 @@
+from django.conf import settings
+
+
+class BudgetExceeded(Exception):
+    """Страница вышла за бюджет запросов или времени."""
+
+
+def budget(view_name):
+    return settings.QUERY_BUDGETS.get(view_name)
+
+
+def violations(view_name, queries, duration_ms):
+    """Превышения бюджета страницы; пустой список, если бюджета нет."""
+    limits = budget(view_name)
+    if limits is None:
+        return []
+    problems = []
+    if queries > limits['queries']:
+        problems.append(
+            f'{queries} SQL-запросов при бюджете {limits["queries"]}'
+        )
+    if duration_ms > limits['ms']:
+        problems.append(
+            f'{duration_ms:.0f} мс при бюджете {limits["ms"]} мс'
+        )
+    return problems
@@ -0,0 +1,93 @@
+import math
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import replicas
+
+MISSING = object()
+# Как часто проверять кэш, пока значение считает другой запрос
+POLL_INTERVAL = 0.05
+
+
+def _lock_key(key):
+    return f'lock:{key}'
+
+
+def _acquire(key):
+    token = uuid.uuid4().hex
+    if cache.add(_lock_key(key), token, settings.CACHE_LOCK_TIMEOUT):
+        return token
+    return None
+
+
+def _release(key, token):
+    # Если вычисление шло дольше CACHE_LOCK_TIMEOUT, блокировка уже может
+    # принадлежать другому запросу
+    if cache.get(_lock_key(key)) == token:
+        cache.delete(_lock_key(key))
+
+
+def _store(key, compute, timeout):
+    started = time.time()
+    with replicas.primary():
+        value = compute()
+    finished = time.time()
+    if timeout is None:
+        cache.set(key, (value, finished - started, math.inf), None)
+    else:
+        cache.set(
+            key, (value, finished - started, finished + timeout),
+            timeout + settings.CACHE_STALE_TIMEOUT,
+        )
+    return value
+
+
+def _wait(key):
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    return MISSING
+
+
+def is_due(delta, expires, beta=None):
+    """Пора ли пересчитывать значение.
+
+    Вероятностное досрочное обновление: чем дольше считается значение
+    (``delta``) и чем ближе срок, тем вероятнее пересчет до истечения.
+    """
+    if beta is None:
+        beta = settings.CACHE_EARLY_RECOMPUTE_BETA
+    jitter = -delta * beta * math.log(1 - random.random())
+    return time.time() + jitter >= expires
+
+
+def get_or_compute(key, compute, timeout, beta=None):
+    """Значение из кэша или результат ``compute()``, сохраненный в кэш.
+
+    Значение хранится еще CACHE_STALE_TIMEOUT секунд после срока: пока
+    один запрос под блокировкой считает новое, остальные получают
+    устаревшее. Если в кэше ничего нет, остальные ждут результат не
+    дольше CACHE_LOCK_WAIT секунд и потом считают сами.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires = entry
+        if not is_due(delta, expires, beta):
+            return value
+    token = _acquire(key)
+    if token is None:
+        if entry is not None:
+            return entry[0]
+        value = _wait(key)
+        return compute() if value is MISSING else value
+    try:
+        return _store(key, compute, timeout)
+    finally:
+        _release(key, token)
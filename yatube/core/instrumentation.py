@@ -0,0 +1,167 @@
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.template.base import Template
+from sorl.thumbnail.base import ThumbnailBackend
+
+_local = threading.local()
+_installed = False
+_install_lock = threading.Lock()
+MISSING = object()
+
+
+class RequestMetrics:
+    """Показатели одного запроса. Время хранится в секундах."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = None
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.thumbnail_time = 0.0
+        self.thumbnails = 0
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+
+    def as_dict(self):
+        return {
+            'duration_ms': round(self.duration * 1000, 3),
+            'queries': self.queries,
+            'sql_ms': round(self.sql_time * 1000, 3),
+            'template_ms': round(self.template_time * 1000, 3),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'thumbnails': self.thumbnails,
+            'thumbnail_ms': round(self.thumbnail_time * 1000, 3),
+        }
+
+    def server_timing(self):
+        return ', '.join([
+            f'total;dur={self.duration * 1000:.1f}',
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'thumb;dur={self.thumbnail_time * 1000:.1f}',
+            f'cache;desc="hits={self.cache_hits} '
+            f'misses={self.cache_misses}"',
+        ])
+
+
+def current():
+    """Показатели запроса, который обрабатывается в этом потоке."""
+    return getattr(_local, 'metrics', None)
+
+
+@contextmanager
+def collect():
+    metrics = RequestMetrics()
+    _local.metrics = metrics
+    try:
+        yield metrics
+    finally:
+        _local.metrics = None
+        metrics.finish()
+
+
+def query_wrapper(execute, sql, params, many, context):
+    metrics = current()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.sql_time += time.perf_counter() - started
+        metrics.queries += 1
+
+
+def _wrap_template_render(render):
+    @wraps(render)
+    def wrapper(self, context):
+        metrics = current()
+        if metrics is None or metrics.template_depth:
+            return render(self, context)
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            metrics.template_time += time.perf_counter() - started
+            metrics.template_depth -= 1
+    return wrapper
+
+
+def _wrap_cache_get(get):
+    @wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        value = get(self, key, MISSING, version=version)
+        metrics = current()
+        if metrics is not None:
+            if value is MISSING:
+                metrics.cache_misses += 1
+            else:
+                metrics.cache_hits += 1
+        return default if value is MISSING else value
+    return wrapper
+
+
+def _wrap_cache_get_many(get_many):
+    @wraps(get_many)
+    def wrapper(self, keys, version=None):
+        keys = list(keys)
+        found = get_many(self, keys, version=version)
+        metrics = current()
+        if metrics is not None:
+            metrics.cache_hits += len(found)
+            metrics.cache_misses += len(keys) - len(found)
+        return found
+    return wrapper
+
+
+def _wrap_thumbnail(create):
+    @wraps(create)
+    def wrapper(*args, **kwargs):
+        metrics = current()
+        if metrics is None:
+            return create(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return create(*args, **kwargs)
+        finally:
+            metrics.thumbnail_time += time.perf_counter() - started
+            metrics.thumbnails += 1
+    return wrapper
+
+
+def install():
+    """Подключает замеры шаблонов, кэша и миниатюр; повторно не действует.
+
+    Обертки считают время, только пока в потоке идет ``collect()``, в
+    остальное время они сводятся к чтению одной переменной потока.
+    """
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        Template.render = _wrap_template_render(Template.render)
+        cache_classes = {type(caches[alias]) for alias in settings.CACHES}
+        for cache_class in cache_classes:
+            cache_class.get = _wrap_cache_get(cache_class.get)
+            # Базовый get_many сам вызывает get, обращения уже посчитаны
+            if cache_class.get_many is not BaseCache.get_many:
+                cache_class.get_many = _wrap_cache_get_many(
+                    cache_class.get_many
+                )
+        ThumbnailBackend._create_thumbnail = _wrap_thumbnail(
+            ThumbnailBackend._create_thumbnail
+        )
+        _installed = True
@@ -0,0 +1,114 @@
+import threading
+from contextlib import contextmanager
+
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+EMPTY_VALUE = cached_db_kvstore.EMPTY_VALUE
+
+
+def thumbnail_file(file_, geometry_string, **options):
+    """Файл миниатюры, которую sorl создал бы для картинки.
+
+    Повторяет вычисление имени миниатюры из ``ThumbnailBackend``, но
+    никогда не открывает и не уменьшает исходную картинку.
+    """
+    backend = default.backend
+    source = ImageFile(file_)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry_string, options)
+    return ImageFile(name, default.storage)
+
+
+@contextmanager
+def prefetched(files, thumbnails):
+    """Загружает записи миниатюр всех картинок страницы одним запросом.
+
+    ``thumbnails`` - пары (геометрия, параметры), как в POST_THUMBNAILS.
+    С хранилищем без ``prefetched`` ничего не делает.
+    """
+    prefetch = getattr(default.kvstore, 'prefetched', None)
+    files = [file_ for file_ in files if file_]
+    if prefetch is None or not files:
+        yield
+        return
+    image_files = [
+        thumbnail_file(file_, geometry_string, **options)
+        for file_ in files
+        for geometry_string, options in thumbnails
+    ]
+    with prefetch(image_files):
+        yield
+
+
+class KVStore(cached_db_kvstore.KVStore):
+    """Хранилище sorl в общем кэше с таблицей в базе как запасным.
+
+    Внутри ``prefetched`` записи всех переданных картинок берутся одним
+    ``get_many`` из кэша, а не найденные в кэше - одним запросом к базе;
+    отдельные ``get`` внутри блока уже не обращаются ни к кэшу, ни к базе.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._local = threading.local()
+
+    @property
+    def _loaded(self):
+        return getattr(self._local, 'values', None)
+
+    def _load_many(self, keys):
+        values = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in values]
+        if missing:
+            rows = dict(
+                KVStoreModel.objects.filter(key__in=missing)
+                .values_list('key', 'value')
+            )
+            # Отсутствие записи тоже запоминается, как в _get_raw
+            found = {key: rows.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(found, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+            values.update(found)
+        return values
+
+    @contextmanager
+    def prefetched(self, image_files):
+        previous = self._loaded
+        keys = list({add_prefix(image_file.key) for image_file in image_files})
+        values = dict(previous or {})
+        values.update(self._load_many(keys))
+        self._local.values = values
+        try:
+            yield
+        finally:
+            self._local.values = previous
+
+    def _get_raw(self, key):
+        loaded = self._loaded
+        if loaded is None or key not in loaded:
+            return super()._get_raw(key)
+        value = loaded[key]
+        return None if value == EMPTY_VALUE else value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        if self._loaded is not None:
+            self._loaded[key] = value
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        if self._loaded is not None:
+            for key in keys:
+                self._loaded.pop(key, None)
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задачи из очереди в нескольких процессах'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=settings.TASK_WORKER_PROCESSES,
+            help='Сколько процессов выполняют задачи'
+        )
+        parser.add_argument(
+            '--lane', action='append', dest='lanes',
+            choices=settings.TASK_LANES,
+            help='Выполнять только задачи этой полосы; можно повторять'
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Завершиться, когда очередь опустеет'
+        )
+
+    def handle(self, *args, processes, lanes, burst, **options):
+        if processes < 1:
+            raise CommandError('Нужен хотя бы один процесс')
+        self.stdout.write(
+            f'Исполнителей: {processes}, полосы: '
+            f'{", ".join(lanes or settings.TASK_LANES)}'
+        )
+        if processes == 1:
+            tasks.Worker(lanes).run(burst)
+        else:
+            tasks.run_pool(processes, lanes, burst)
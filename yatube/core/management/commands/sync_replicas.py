@@ -0,0 +1,39 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SQLITE = 'django.db.backends.sqlite3'
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в реплики DATABASE_REPLICAS, '
+        'чтобы проверить чтение из реплик без сервера базы'
+    )
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        if primary['ENGINE'] != SQLITE:
+            raise CommandError('Копировать можно только базу SQLite')
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплик нет, задайте SQLITE_REPLICAS')
+        source = sqlite3.connect(primary['NAME'])
+        try:
+            for alias in settings.DATABASE_REPLICAS:
+                replica = settings.DATABASES[alias]
+                if replica['ENGINE'] != SQLITE:
+                    raise CommandError(f'Реплика {alias} не в SQLite')
+                connections[alias].close()
+                # Резервная копия SQLite согласована, даже если в основную
+                # базу в это время пишут
+                target = sqlite3.connect(replica['NAME'])
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f'{alias}: {replica["NAME"]}')
+        finally:
+            source.close()
+        self.stdout.write(self.style.SUCCESS('Реплики обновлены'))
@@ -0,0 +1,261 @@
+import atexit
+import glob
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+HISTOGRAMS = {
+    'yatube_request_duration_seconds': (
+        'Время обработки запроса в секундах',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    ),
+    'yatube_request_queries': (
+        'Число SQL-запросов при обработке запроса',
+        (0, 1, 2, 3, 5, 10, 20, 50, 100, 200),
+    ),
+    'yatube_requested_page': (
+        'Номер запрошенной страницы ленты',
+        (1, 2, 3, 5, 10, 50, 100, 500, 1000, 5000),
+    ),
+}
+
+COUNTERS = {
+    'yatube_requests_total': 'Число обработанных запросов',
+    'yatube_cache_requests_total': 'Обращения к кэшу по результату',
+}
+
+GAUGES = {
+    'yatube_task_queue_depth': 'Задачи в очереди',
+}
+
+CACHE_HIT_RATIO = 'yatube_cache_hit_ratio'
+
+
+def _labels_key(labels):
+    return ','.join(f'{key}={value}' for key, value in sorted(labels.items()))
+
+
+def _labels_text(key, extra=None):
+    pairs = [pair.split('=', 1) for pair in key.split(',') if pair]
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, value.replace('\\', '\\\\').replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge_values(total, metrics):
+    for name, values in metrics.items():
+        merged = total.setdefault(name, {})
+        for key, value in values.items():
+            merged[key] = merged.get(key, 0) + value
+
+
+def _merge_histograms(total, metrics):
+    for name, values in metrics.items():
+        merged = total.setdefault(name, {})
+        for key, series in values.items():
+            result = merged.setdefault(key, {
+                'buckets': [0] * len(series['buckets']), 'sum': 0, 'count': 0
+            })
+            for position, value in enumerate(series['buckets']):
+                result['buckets'][position] += value
+            result['sum'] += series['sum']
+            result['count'] += series['count']
+
+
+class Registry:
+    """Метрики процесса, которые периодически сбрасываются в файл.
+
+    Каждый процесс WSGI-сервера пишет свой файл ``metrics_<pid>.json``
+    в METRICS_DIR; страница метрик складывает файлы всех процессов.
+    Счетчики и гистограммы завершившихся процессов продолжают
+    учитываться, значения датчиков берутся только у живых процессов.
+    Общие датчики (``shared``) описывают весь узел, например очередь в
+    базе, и считаются один раз при выводе страницы.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauge_callbacks = {}
+        self.shared_gauge_callbacks = {}
+        self.last_flush = 0.0
+
+    def inc(self, name, labels, amount=1):
+        key = _labels_key(labels)
+        with self.lock:
+            values = self.counters.setdefault(name, {})
+            values[key] = values.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        bounds = HISTOGRAMS[name][1]
+        key = _labels_key(labels)
+        with self.lock:
+            series = self.histograms.setdefault(name, {}).setdefault(
+                key, {'buckets': [0] * len(bounds), 'sum': 0, 'count': 0}
+            )
+            for position, bound in enumerate(bounds):
+                if value <= bound:
+                    series['buckets'][position] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def register_gauge(self, name, callback, shared=False):
+        if shared:
+            self.shared_gauge_callbacks[name] = callback
+        else:
+            self.gauge_callbacks[name] = callback
+
+    def path(self, pid=None):
+        return os.path.join(
+            settings.METRICS_DIR, f'metrics_{pid or os.getpid()}.json'
+        )
+
+    def snapshot(self):
+        with self.lock:
+            data = {
+                'pid': os.getpid(),
+                'counters': json.loads(json.dumps(self.counters)),
+                'histograms': json.loads(json.dumps(self.histograms)),
+            }
+        data['gauges'] = {
+            name: {'': callback()}
+            for name, callback in self.gauge_callbacks.items()
+        }
+        return data
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        interval = settings.METRICS_FLUSH_INTERVAL
+        if not force and now - self.last_flush < interval:
+            return
+        self.last_flush = now
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(
+            dir=settings.METRICS_DIR, suffix='.tmp'
+        )
+        with os.fdopen(descriptor, 'w') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(temporary, self.path())
+
+    def collect(self):
+        """Сумма метрик всех процессов."""
+        self.flush(force=True)
+        counters, histograms, gauges = {}, {}, {}
+        pattern = os.path.join(settings.METRICS_DIR, 'metrics_*.json')
+        for path in glob.glob(pattern):
+            try:
+                with open(path) as file:
+                    data = json.load(file)
+            except (OSError, ValueError):
+                continue
+            _merge_values(counters, data['counters'])
+            _merge_histograms(histograms, data['histograms'])
+            if _pid_alive(data['pid']):
+                _merge_values(gauges, data['gauges'])
+        return counters, histograms, gauges
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus."""
+        counters, histograms, gauges = self.collect()
+        lines = []
+        for name, (description, bounds) in HISTOGRAMS.items():
+            lines += [f'# HELP {name} {description}',
+                      f'# TYPE {name} histogram']
+            for key, series in sorted(histograms.get(name, {}).items()):
+                for bound, value in zip(bounds, series['buckets']):
+                    labels = _labels_text(key, ('le', _number(bound)))
+                    lines.append(f'{name}_bucket{labels} {value}')
+                labels = _labels_text(key, ('le', '+Inf'))
+                lines.append(f'{name}_bucket{labels} {series["count"]}')
+                labels = _labels_text(key)
+                lines.append(f'{name}_sum{labels} {_number(series["sum"])}')
+                lines.append(f'{name}_count{labels} {series["count"]}')
+        for name, description in COUNTERS.items():
+            lines += [f'# HELP {name} {description}',
+                      f'# TYPE {name} counter']
+            for key, value in sorted(counters.get(name, {}).items()):
+                lines.append(f'{name}{_labels_text(key)} {value}')
+        cache = counters.get('yatube_cache_requests_total', {})
+        hits = cache.get('result=hit', 0)
+        total = hits + cache.get('result=miss', 0)
+        gauges[CACHE_HIT_RATIO] = {'': hits / total if total else 0}
+        for name, callback in self.shared_gauge_callbacks.items():
+            gauges[name] = {'': callback()}
+        descriptions = {
+            **GAUGES, CACHE_HIT_RATIO: 'Доля попаданий в кэш'
+        }
+        for name, description in descriptions.items():
+            lines += [f'# HELP {name} {description}',
+                      f'# TYPE {name} gauge']
+            for key, value in sorted(gauges.get(name, {}).items()):
+                lines.append(f'{name}{_labels_text(key)} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def record_request(request, response, metrics):
+    """Учитывает обработанный запрос в метриках процесса."""
+    match = request.resolver_match
+    labels = {'view': match.view_name if match else 'unmatched'}
+    registry.inc('yatube_requests_total', {
+        **labels, 'status': str(response.status_code)
+    })
+    registry.observe(
+        'yatube_request_duration_seconds', labels, metrics.duration
+    )
+    registry.observe('yatube_request_queries', labels, metrics.queries)
+    if metrics.cache_hits:
+        registry.inc(
+            'yatube_cache_requests_total', {'result': 'hit'},
+            metrics.cache_hits
+        )
+    if metrics.cache_misses:
+        registry.inc(
+            'yatube_cache_requests_total', {'result': 'miss'},
+            metrics.cache_misses
+        )
+    page = request.GET.get('page')
+    if page is None and 'cursor' not in request.GET:
+        page = '1'
+    if page is not None and page.isdigit():
+        registry.observe('yatube_requested_page', labels, int(page))
+    registry.flush()
+
+
+@atexit.register
+def _flush_on_exit():
+    if settings.configured and settings.METRICS_ENABLED:
+        try:
+            registry.flush(force=True)
+        except OSError:
+            pass
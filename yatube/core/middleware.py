@@ -0,0 +1,239 @@
+import hashlib
+import json
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from . import budgets, instrumentation, metrics as prometheus, replicas
+
+logger = logging.getLogger('yatube.performance')
+
+# Запросы, после которых клиент читает из основной базы
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class PerformanceMiddleware:
+    """Замеряет время запроса, SQL, шаблонов, кэша и миниатюр.
+
+    Пишет показатели в журнал ``yatube.performance`` одной строкой JSON
+    и, если включено, в заголовок ``Server-Timing``. При METRICS_ENABLED
+    учитывает запрос в метриках Prometheus, а при DEBUG и
+    QUERY_BUDGET_MODE проверяет бюджет страницы. Если ничего из этого не
+    включено, исключается из цепочки middleware.
+    """
+
+    def __init__(self, get_response):
+        self.check_budgets = bool(
+            settings.DEBUG and settings.QUERY_BUDGET_MODE
+        )
+        if not (settings.PERFORMANCE_INSTRUMENTATION
+                or settings.METRICS_ENABLED or self.check_budgets):
+            raise MiddlewareNotUsed
+        instrumentation.install()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with ExitStack() as stack:
+            metrics = stack.enter_context(instrumentation.collect())
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(instrumentation.query_wrapper)
+                )
+            request.performance = metrics
+            response = self.get_response(request)
+        if settings.METRICS_ENABLED:
+            prometheus.record_request(request, response, metrics)
+        if settings.PERFORMANCE_INSTRUMENTATION:
+            self.log(request, response, metrics)
+        if self.check_budgets:
+            self.check_budget(request, metrics)
+        return response
+
+    def check_budget(self, request, metrics):
+        match = request.resolver_match
+        if match is None:
+            return
+        problems = budgets.violations(
+            match.view_name, metrics.queries, metrics.duration * 1000
+        )
+        if not problems:
+            return
+        message = f'{match.view_name}: {"; ".join(problems)}'
+        if settings.QUERY_BUDGET_MODE == 'raise':
+            raise budgets.BudgetExceeded(message)
+        logger.warning(message)
+
+    def log(self, request, response, metrics):
+        match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            **metrics.as_dict(),
+        }
+        logger.info(json.dumps(record, ensure_ascii=False), extra=record)
+        if settings.PERFORMANCE_SERVER_TIMING:
+            response['Server-Timing'] = metrics.server_timing()
+
+
+def _url_hash(request):
+    return hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+
+
+class ConditionalPageMiddleware:
+    """Ответ 304 без построения страницы, если ее данные не менялись.
+
+    После ответа запоминает версии данных страницы из
+    ``request.page_cache_versions`` для пары адрес - пользователь и
+    выдает ETag из адреса, пользователя, CSRF-cookie и этих версий. При
+    повторном запросе ETag считается по текущим версиям из кэша до
+    вызова view; совпадение с If-None-Match дает 304. Версии страниц,
+    прочитанных из реплики, не запоминаются.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PAGE_VERSIONS_TIMEOUT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def etag(self, request, versions):
+        parts = [
+            request.get_full_path(),
+            str(request.user.pk or ''),
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+            *(f'{key}={value}' for key, value in sorted(versions.items())),
+        ]
+        return quote_etag(hashlib.md5('|'.join(parts).encode()).hexdigest())
+
+    def __call__(self, request):
+        if (request.method not in ('GET', 'HEAD')
+                or 'messages' in request.COOKIES):
+            return self.get_response(request)
+        key = f'page_versions:{_url_hash(request)}:{request.user.pk or 0}'
+        stored = cache.get(key)
+        if ('HTTP_IF_NONE_MATCH' in request.META and stored is not None
+                and cache.get_many(list(stored)) == stored):
+            etag = self.etag(request, stored)
+            response = get_conditional_response(request, etag=etag)
+            if response is not None:
+                response['ETag'] = etag
+                return response
+        response = self.get_response(request)
+        versions = getattr(request, 'page_cache_versions', None)
+        if (versions and response.status_code == 200
+                and not response.streaming
+                and not getattr(request, 'replica', None)):
+            # Запись в кэш дороже чтения, версии пишутся, только если
+            # изменились
+            if versions != stored:
+                cache.set(key, versions, settings.PAGE_VERSIONS_TIMEOUT)
+            response['ETag'] = self.etag(request, versions)
+            patch_cache_control(
+                response, max_age=0, must_revalidate=True,
+                private=request.user.is_authenticated,
+            )
+        return response
+
+
+class AnonymousPageCacheMiddleware:
+    """Готовые страницы для анонимных читателей.
+
+    Сохраняются только страницы, view которых перечислил в
+    ``request.page_cache_versions`` версии данных, от которых страница
+    зависит (ключ версии в кэше и ее значение). Копия отдается, пока ни
+    одна из этих версий не изменилась, поэтому изменение поста, группы
+    или автора сбрасывает только зависящие от них страницы. Ключ копии
+    строится из полного адреса с параметрами запроса. Страницы,
+    прочитанные из реплики, не сохраняются.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PAGE_CACHE_TIMEOUT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated
+                or 'messages' in request.COOKIES):
+            return self.get_response(request)
+        key = f'page:{_url_hash(request)}'
+        entry = cache.get(key)
+        if entry is not None:
+            versions, response = entry
+            if cache.get_many(list(versions)) == versions:
+                request.page_cache_versions = versions
+                return response
+        response = self.get_response(request)
+        versions = getattr(request, 'page_cache_versions', None)
+        if (versions and request.method == 'GET'
+                and response.status_code == 200
+                and not response.streaming and not response.cookies
+                and not getattr(request, 'replica', None)):
+            cache.set(key, (versions, response), settings.PAGE_CACHE_TIMEOUT)
+        return response
+
+
+class ReplicaMiddleware:
+    """Чтение страниц из REPLICA_VIEWS из реплик DATABASE_REPLICAS.
+
+    Если запрос что-то записал в основную базу (любым методом, в том
+    числе GET подписки), клиент получает cookie REPLICA_STICKY_COOKIE на
+    REPLICA_STICKY_SECONDS секунд и все это время читает из основной
+    базы, чтобы видеть свои изменения, пока реплики их не получили. Если
+    запрос к реплике упал с ошибкой базы, реплика считается недоступной,
+    а страница строится из основной.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        wrote = []
+
+        def watch(execute, sql, params, many, context):
+            if sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS):
+                wrote.append(True)
+            return execute(sql, params, many, context)
+
+        try:
+            with connections[DEFAULT_DB_ALIAS].execute_wrapper(watch):
+                response = self.get_response(request)
+        finally:
+            replicas.use(None)
+        if wrote:
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method not in ('GET', 'HEAD')
+                or settings.REPLICA_STICKY_COOKIE in request.COOKIES
+                or request.resolver_match.view_name
+                not in settings.REPLICA_VIEWS):
+            return None
+        alias = replicas.choose()
+        if alias is None:
+            return None
+        replicas.use(alias)
+        # Страницу из реплики не сохраняют кэш страниц и ETag
+        request.replica = alias
+        try:
+            return view_func(request, *view_args, **view_kwargs)
+        except DatabaseError as error:
+            replicas.mark_unhealthy(alias, error)
+        replicas.use(None)
+        request.replica = None
+        return view_func(request, *view_args, **view_kwargs)
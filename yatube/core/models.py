@@ -0,0 +1,51 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """Отложенный вызов функции из очереди ``core.tasks``.
+
+    Выполненные задачи удаляются, в таблице остаются ждущие, запущенные
+    и те, что не удались после всех попыток.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Не выполнена'),
+    )
+
+    name = models.CharField('Функция', max_length=200)
+    payload = models.TextField('Аргументы в JSON')
+    priority = models.PositiveSmallIntegerField(
+        'Приоритет', default=0,
+        help_text='Номер полосы в TASK_LANES, меньше - раньше'
+    )
+    state = models.CharField(
+        'Состояние', max_length=10, choices=STATES, default=QUEUED
+    )
+    dedupe_key = models.CharField(
+        'Ключ повтора', max_length=255, unique=True, null=True, blank=True,
+        help_text='Пока задача ждет, такая же в очередь не ставится'
+    )
+    attempts = models.PositiveSmallIntegerField('Попытки', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Наибольшее число попыток')
+    run_after = models.DateTimeField('Не раньше', default=timezone.now)
+    locked_until = models.DateTimeField(
+        'Занята до', null=True, blank=True
+    )
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        indexes = [
+            models.Index(fields=['state', 'priority', 'run_after'],
+                         name='task_claim_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,101 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.utils import ConnectionDoesNotExist
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+# Алиас реплики -> (время проверки, доступна ли)
+_health = {}
+
+
+def current():
+    """Реплика, из которой читает текущий запрос, или None."""
+    return getattr(_local, 'alias', None)
+
+
+def use(alias):
+    _local.alias = alias
+
+
+@contextmanager
+def primary():
+    """Чтение из основной базы внутри запроса, читающего из реплики.
+
+    Так строится все, что сохраняется в общий кэш под текущими версиями
+    данных: реплика может еще не получить изменения, которые эти версии
+    уже отметили.
+    """
+    alias = current()
+    use(None)
+    try:
+        yield
+    finally:
+        use(alias)
+
+
+def _probe(alias):
+    # Пустой файл SQLite тоже открывается, поэтому читается таблица,
+    # которая есть в любой копии базы
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1 FROM django_migrations LIMIT 1')
+        return True
+    except (DatabaseError, ConnectionDoesNotExist) as error:
+        logger.warning('Реплика %s недоступна: %s', alias, error)
+        return False
+
+
+def is_healthy(alias):
+    """Доступна ли реплика; проверка повторяется раз в интервал."""
+    now = time.monotonic()
+    checked = _health.get(alias)
+    if checked is not None and (
+        now - checked[0] < settings.REPLICA_HEALTH_INTERVAL
+    ):
+        return checked[1]
+    healthy = _probe(alias)
+    _health[alias] = (now, healthy)
+    return healthy
+
+
+def mark_unhealthy(alias, error):
+    logger.warning('Ошибка чтения из реплики %s: %s', alias, error)
+    _health[alias] = (time.monotonic(), False)
+
+
+def choose():
+    """Случайная доступная реплика или None, если читать из основной."""
+    healthy = [
+        alias for alias in settings.DATABASE_REPLICAS if is_healthy(alias)
+    ]
+    return random.choice(healthy) if healthy else None
+
+
+class ReplicaRouter:
+    """Чтение из реплики, выбранной для запроса ``ReplicaMiddleware``.
+
+    Вне таких запросов и для любой записи используется основная база.
+    Реплики - копии основной базы, поэтому связи между объектами из
+    разных баз разрешены, а миграции применяются только к основной.
+    """
+
+    def db_for_read(self, model, **hints):
+        return current() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,246 @@
+import json
+import logging
+import multiprocessing
+import signal
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+# Сколько задач пробовать занять за один запрос, если их разбирают
+# несколько исполнителей
+CLAIM_BATCH = 10
+
+_thread = None
+_thread_lock = threading.Lock()
+_wakeup = threading.Event()
+
+
+def lane_priority(lane):
+    return settings.TASK_LANES.index(lane)
+
+
+def enqueue(name, args=(), kwargs=None, lane='default', dedupe_key=None,
+            max_attempts=None):
+    """Ставит вызов функции ``name`` в очередь.
+
+    Запись появляется в той же транзакции, что и изменения, ради которых
+    ставится задача, поэтому задача не выполнится раньше их фиксации и
+    пропадет при откате. Аргументы должны сохраняться в JSON. Если задача
+    с тем же ``dedupe_key`` еще в таблице - ждет, выполняется или не
+    удалась после всех попыток, - новая не ставится.
+    """
+    Task.objects.bulk_create([Task(
+        name=name,
+        payload=json.dumps({'args': list(args), 'kwargs': kwargs or {}}),
+        priority=lane_priority(lane),
+        dedupe_key=dedupe_key,
+        max_attempts=max_attempts or settings.TASK_MAX_ATTEMPTS,
+    )], ignore_conflicts=True)
+    transaction.on_commit(_wake)
+
+
+def task(lane='default', dedupe=None, max_attempts=None):
+    """Делает из функции задачу: ``func.delay(*args)`` ставит ее в очередь.
+
+    ``dedupe`` получает аргументы вызова и возвращает ключ повтора; вызов
+    самой функции по-прежнему выполняет ее сразу.
+    """
+    def decorator(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+
+        def delay(*args, **kwargs):
+            key = None
+            if dedupe is not None:
+                key = f'{name}:{dedupe(*args, **kwargs)}'[:255]
+            enqueue(name, args, kwargs, lane, key, max_attempts)
+
+        func.delay = delay
+        return func
+    return decorator
+
+
+def retry_delay(attempts):
+    """Пауза перед следующей попыткой: удваивается с каждой неудачей."""
+    return min(
+        settings.TASK_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.TASK_RETRY_MAX_DELAY,
+    )
+
+
+def queue_depth():
+    return Task.objects.filter(state=Task.QUEUED).count()
+
+
+class Worker:
+    """Выбирает задачи из очереди и выполняет их по одной.
+
+    Задача занимается условным UPDATE, поэтому несколько процессов и
+    потоков не выполнят одну задачу дважды. Занятая задача, которую не
+    завершили за TASK_LEASE секунд (процесс упал), снова доступна.
+    """
+
+    def __init__(self, lanes=None, wakeup=None):
+        self.priorities = (
+            None if not lanes else [lane_priority(lane) for lane in lanes]
+        )
+        self.wakeup = wakeup or threading.Event()
+        self.stopping = False
+
+    def stop(self, *args):
+        self.stopping = True
+        self.wakeup.set()
+
+    def _available(self, now):
+        tasks = Task.objects.filter(
+            Q(state=Task.QUEUED, run_after__lte=now)
+            | Q(state=Task.RUNNING, locked_until__lt=now)
+        )
+        if self.priorities is not None:
+            tasks = tasks.filter(priority__in=self.priorities)
+        return tasks
+
+    def claim(self):
+        now = timezone.now()
+        available = self._available(now)
+        candidates = available.order_by(
+            'priority', 'run_after', 'pk'
+        ).values_list('pk', flat=True)[:CLAIM_BATCH]
+        for pk in candidates:
+            # Ключ повтора остается за задачей, в том числе сбойной:
+            # повторы не копятся, пока ее не удалят
+            claimed = available.filter(pk=pk).update(
+                state=Task.RUNNING,
+                locked_until=now + timedelta(seconds=settings.TASK_LEASE),
+                attempts=F('attempts') + 1,
+            )
+            if claimed:
+                return Task.objects.get(pk=pk)
+        return None
+
+    def execute(self, task):
+        payload = json.loads(task.payload)
+        try:
+            func = import_string(task.name)
+            with transaction.atomic():
+                func(*payload['args'], **payload['kwargs'])
+        except Exception:
+            self.failed(task, traceback.format_exc())
+        else:
+            Task.objects.filter(pk=task.pk).delete()
+
+    def failed(self, task, error):
+        logger.error('Задача %s #%s не выполнена:\n%s',
+                     task.name, task.pk, error)
+        tasks = Task.objects.filter(pk=task.pk)
+        if task.attempts >= task.max_attempts:
+            tasks.update(state=Task.FAILED, locked_until=None,
+                         last_error=error)
+            return
+        tasks.update(
+            state=Task.QUEUED,
+            locked_until=None,
+            last_error=error,
+            run_after=timezone.now() + timedelta(
+                seconds=retry_delay(task.attempts)
+            ),
+        )
+
+    def run_once(self):
+        """Выполняет одну задачу; False, если выполнять нечего."""
+        task = self.claim()
+        if task is None:
+            return False
+        self.execute(task)
+        return True
+
+    def run(self, burst=False):
+        """Выполняет задачи, пока не вызван ``stop``.
+
+        При ``burst`` останавливается, когда очередь опустела.
+        """
+        while not self.stopping:
+            try:
+                worked = self.run_once()
+            finally:
+                close_old_connections()
+            if worked:
+                continue
+            if burst:
+                return
+            self.wakeup.wait(settings.TASK_POLL_INTERVAL)
+            self.wakeup.clear()
+
+
+def run_pending(lanes=None):
+    """Выполняет все готовые задачи в текущем потоке и соединении.
+
+    Соединение не закрывается между задачами, поэтому функция подходит
+    для тестов внутри транзакции.
+    """
+    worker = Worker(lanes)
+    while worker.run_once():
+        pass
+
+
+def _wake():
+    global _thread
+    if not settings.TASK_WORKER_THREAD:
+        return
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(
+                target=Worker(wakeup=_wakeup).run, name='tasks', daemon=True
+            )
+            _thread.start()
+    _wakeup.set()
+
+
+def _serve(lanes, burst):
+    worker = Worker(lanes)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run(burst)
+
+
+def run_pool(processes, lanes=None, burst=False):
+    """Запускает ``processes`` процессов-исполнителей и ждет их.
+
+    По SIGTERM или SIGINT каждый процесс доделывает текущую задачу и
+    завершается.
+    """
+    # Соединения с базой нельзя делить с дочерними процессами
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    children = [
+        context.Process(target=_serve, args=(lanes, burst), name='tasks')
+        for _ in range(processes)
+    ]
+    for child in children:
+        child.start()
+
+    def stop(*args):
+        for child in children:
+            if child.is_alive():
+                child.terminate()
+
+    # SIGINT с терминала получают все процессы группы сразу
+    previous = (
+        signal.signal(signal.SIGTERM, stop),
+        signal.signal(signal.SIGINT, signal.SIG_IGN),
+    )
+    try:
+        for child in children:
+            child.join()
+    finally:
+        signal.signal(signal.SIGTERM, previous[0])
+        signal.signal(signal.SIGINT, previous[1])
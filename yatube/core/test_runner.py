@@ -0,0 +1,42 @@
+import shutil
+import tempfile
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+@contextmanager
+def isolated_caches():
+    """Подменяет файлы кэшей из настроек файлами во временном каталоге.
+
+    Кэш SQLite из настроек общий и переживает перезапуск, а тесты очищают
+    его; временный каталог удаляется на выходе.
+    """
+    cache_dir = tempfile.mkdtemp(prefix='yatube-cache-')
+    caches = {
+        alias: {**options, 'LOCATION': f'{cache_dir}/{alias}.sqlite3'}
+        for alias, options in settings.CACHES.items()
+    }
+    try:
+        with override_settings(CACHES=caches):
+            yield
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+class TestRunner(DiscoverRunner):
+    """Запускает тесты с отдельным кэшем во временном каталоге.
+
+    Для pytest то же делает ``conftest.py`` в корне репозитория.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.isolation = ExitStack()
+        self.isolation.enter_context(isolated_caches())
+
+    def teardown_test_environment(self, **kwargs):
+        self.isolation.close()
+        super().teardown_test_environment(**kwargs)
@@ -1,4 +1,55 @@
-from django.test import TestCase
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import OperationalError
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from sorl.thumbnail.images import ImageFile, serialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import caching, metrics, replicas, tasks
+from .caching import get_or_compute
+from .cache import SQLiteCache
+from .kvstore import KVStore
+from .middleware import (
+    AnonymousPageCacheMiddleware, ConditionalPageMiddleware,
+    ReplicaMiddleware, _url_hash,
+)
+from .models import Task
+
+# Вызовы задач из тестов очереди
+CALLS = []
+
+
+@tasks.task(dedupe=lambda key: key)
+def record(key):
+    CALLS.append(key)
+
+
+@tasks.task(lane='high')
+def record_urgent(key):
+    CALLS.append(key)
+
+
+@tasks.task(max_attempts=2)
+def explode():
+    raise RuntimeError('Сбой задачи')
+
+
+@tasks.task(dedupe=lambda key: key, max_attempts=1)
+def explode_once(key):
+    raise RuntimeError('Сбой задачи')
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +57,448 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(
+        PERFORMANCE_INSTRUMENTATION=True, PERFORMANCE_SERVER_TIMING=True
+    )
+    def test_request_metrics_are_logged(self):
+        """Показатели запроса пишутся в журнал и в Server-Timing."""
+        with self.assertLogs('yatube.performance', 'INFO') as logs:
+            response = self.client.get('/')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertGreater(record['queries'], 0)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertGreater(record['cache_hits'] + record['cache_misses'], 0)
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+    def test_disabled_instrumentation_adds_nothing(self):
+        """Выключенные замеры не меняют ответ."""
+        response = self.client.get('/')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        override = override_settings(
+            METRICS_ENABLED=True, METRICS_DIR=self.directory
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        metrics.registry.counters.clear()
+        metrics.registry.histograms.clear()
+
+    def test_metrics_page(self):
+        """Страница метрик показывает гистограммы по имени маршрута."""
+        self.client.get('/', {'page': 2})
+        content = self.client.get('/metrics/').content.decode()
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 1',
+            content,
+        )
+        self.assertIn(
+            'yatube_requested_page_bucket{view="posts:index",le="2"} 1',
+            content,
+        )
+        self.assertIn('yatube_request_queries_bucket', content)
+        self.assertIn('yatube_cache_hit_ratio', content)
+        self.assertIn('yatube_task_queue_depth 0', content)
+
+    def test_metrics_of_other_processes_are_summed(self):
+        """Метрики завершившихся процессов учитываются, датчики - нет."""
+        other = metrics.Registry()
+        other.inc('yatube_requests_total', {'view': 'posts:index'}, 5)
+        other.register_gauge('yatube_task_queue_depth', lambda: 7)
+        data = other.snapshot()
+        data['pid'] = 2 ** 22 + 1
+        with open(os.path.join(self.directory, 'metrics_1.json'), 'w') as f:
+            json.dump(data, f)
+        metrics.registry.inc('yatube_requests_total', {'view': 'posts:index'})
+        content = metrics.registry.render()
+        self.assertIn('yatube_requests_total{view="posts:index"} 6', content)
+        self.assertNotIn('yatube_task_queue_depth 7', content)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_metrics_page_disabled(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 404)
+
+
+def _increment(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {})
+
+    def test_get_set_add_delete(self):
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertTrue(self.cache.add('new', 'value'))
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get('key', 'default'), 'default')
+
+    def test_expired_values_are_missing(self):
+        self.cache.set('key', 'value', timeout=0)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.has_key('key'))
+        self.assertTrue(self.cache.add('key', 'value'))
+
+    def test_versions(self):
+        self.cache.set('key', 'first', version=1)
+        self.cache.set('key', 'second', version=2)
+        self.assertEqual(self.cache.get('key', version=1), 'first')
+        self.assertEqual(self.cache.get('key', version=2), 'second')
+
+    def test_release_prefix(self):
+        """Значения старой выкладки не читаются новой из того же файла."""
+        self.assertEqual(
+            settings.CACHES['default']['KEY_PREFIX'], settings.RELEASE
+        )
+        old = SQLiteCache(self.location, {'KEY_PREFIX': 'old'})
+        new = SQLiteCache(self.location, {'KEY_PREFIX': 'new'})
+        old.set('key', 'value')
+        self.assertIsNone(new.get('key'))
+
+    def test_many(self):
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2}
+        )
+        self.cache.delete_many(['a', 'b'])
+        self.assertEqual(self.cache.get_many(['a', 'b']), {})
+
+    def test_cull(self):
+        cache = SQLiteCache(self.location, {'OPTIONS': {
+            'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2, 'CULL_INTERVAL': 5,
+        }})
+        cache.set_many({f'key{number}': number for number in range(20)})
+        self.assertLessEqual(len(cache.get_many(
+            [f'key{number}' for number in range(20)]
+        )), 10)
+
+    def test_incr_is_shared_between_processes(self):
+        """Увеличение счетчика атомарно для нескольких процессов."""
+        self.cache.set('counter', 0)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=_increment, args=(self.location, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+        self.assertEqual(self.cache.decr('counter', 10), 190)
+
+
+class GetOrComputeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def test_value_is_computed_once(self):
+        self.assertEqual(get_or_compute('key', self.compute, 60), 1)
+        self.assertEqual(get_or_compute('key', self.compute, 60), 1)
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_value_is_served_while_locked(self):
+        """Пока значение пересчитывает другой запрос, отдается старое."""
+        cache.set('key', ('old', 0, time.time() - 1), 60)
+        cache.add('lock:key', 'other')
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'old')
+        self.assertEqual(self.calls, 0)
+        cache.delete('lock:key')
+        self.assertEqual(get_or_compute('key', self.compute, 60), 1)
+
+    def test_early_recompute(self):
+        """Долгое вычисление обновляется до истечения срока."""
+        cache.set('key', ('old', 10 ** 6, time.time() + 60), 60)
+        self.assertEqual(get_or_compute('key', self.compute, 60), 1)
+        self.assertFalse(caching.is_due(0, time.time() + 60))
+
+    @override_settings(CACHE_LOCK_WAIT=0.1)
+    def test_missing_value_is_computed_after_waiting(self):
+        cache.add('lock:key', 'other')
+        self.assertEqual(get_or_compute('key', self.compute, 60), 1)
+        self.assertIsNone(cache.get('key'))
+
+    def test_stale_cache_tag(self):
+        template = Template(
+            '{% load stale_cache %}'
+            '{% stale_cache 60 fragment name %}{{ name }}{% endstale_cache %}'
+        )
+        self.assertEqual(template.render(Context({'name': 'a'})), 'a')
+        cache.set(
+            make_template_fragment_key('fragment', ['a']),
+            ('cached', 0, time.time() + 60),
+        )
+        self.assertEqual(template.render(Context({'name': 'a'})), 'cached')
+
+
+class KVStoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.store = KVStore()
+        self.files = [ImageFile(f'{name}.jpg') for name in 'abc']
+        for image_file in self.files[:2]:
+            image_file.set_size((960, 339))
+            KVStoreModel.objects.create(
+                key=add_prefix(image_file.key),
+                value=serialize_image_file(image_file),
+            )
+
+    def get_all(self):
+        return [self.store.get(image_file) for image_file in self.files]
+
+    def test_prefetch_reads_database_once(self):
+        """Записи страницы загружаются из базы одним запросом."""
+        with self.assertNumQueries(1):
+            with self.store.prefetched(self.files):
+                found = self.get_all()
+        self.assertEqual(
+            [image_file and image_file.name for image_file in found],
+            ['a.jpg', 'b.jpg', None],
+        )
+
+    def test_prefetched_values_are_cached(self):
+        """Найденные и отсутствующие записи запоминаются в кэше."""
+        with self.store.prefetched(self.files):
+            pass
+        with self.assertNumQueries(0):
+            with self.store.prefetched(self.files):
+                found = self.get_all()
+            self.assertIsNone(found[2])
+            self.assertIsNotNone(self.store.get(self.files[0]))
+
+    def test_delete_inside_prefetch(self):
+        with self.store.prefetched(self.files):
+            self.store._delete(self.files[0].key)
+            self.assertIsNone(self.store.get(self.files[0]))
+        self.assertIsNone(self.store.get(self.files[0]))
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_delayed_call_runs_in_worker(self):
+        """Задача выполняется исполнителем и удаляется из очереди."""
+        record.delay('first')
+        self.assertEqual(CALLS, [])
+        self.assertEqual(tasks.queue_depth(), 1)
+        tasks.run_pending()
+        self.assertEqual(CALLS, ['first'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_waiting_task_is_not_duplicated(self):
+        """Пока задача ждет, такая же в очередь не ставится."""
+        record.delay('same')
+        record.delay('same')
+        record.delay('other')
+        tasks.run_pending()
+        self.assertEqual(sorted(CALLS), ['other', 'same'])
+
+    def test_high_lane_runs_first(self):
+        """Задачи полосы high выполняются раньше поставленных до них."""
+        record.delay('default')
+        record_urgent.delay('high')
+        tasks.run_pending()
+        self.assertEqual(CALLS, ['high', 'default'])
+
+    def test_worker_takes_only_its_lanes(self):
+        record.delay('default')
+        record_urgent.delay('high')
+        tasks.run_pending(lanes=['high'])
+        self.assertEqual(CALLS, ['high'])
+        self.assertEqual(tasks.queue_depth(), 1)
+
+    def test_failed_task_is_retried_with_backoff(self):
+        """Неудачная задача повторяется позже, затем помечается сбойной."""
+        explode.delay()
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run_pending()
+        task = Task.objects.get()
+        self.assertEqual(task.state, Task.QUEUED)
+        self.assertEqual(task.attempts, 1)
+        self.assertIn('Сбой задачи', task.last_error)
+        self.assertGreater(task.run_after, timezone.now())
+        Task.objects.update(run_after=timezone.now())
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run_pending()
+        task.refresh_from_db()
+        self.assertEqual(task.state, Task.FAILED)
+        self.assertEqual(task.attempts, 2)
+
+    def test_failed_task_keeps_dedupe_key(self):
+        """Сбойная задача не дает поставить такую же еще раз."""
+        explode_once.delay('broken')
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run_pending()
+        explode_once.delay('broken')
+        task = Task.objects.get()
+        self.assertEqual(task.state, Task.FAILED)
+        self.assertEqual(task.dedupe_key, 'core.tests.explode_once:broken')
+
+    def test_retry_delay_is_capped(self):
+        with override_settings(TASK_RETRY_DELAY=10, TASK_RETRY_MAX_DELAY=60):
+            self.assertEqual(
+                [tasks.retry_delay(n) for n in range(1, 5)], [10, 20, 40, 60]
+            )
+
+    def test_expired_lease_is_taken_again(self):
+        """Задачу упавшего исполнителя берет другой после конца аренды."""
+        record.delay('lost')
+        Task.objects.update(
+            state=Task.RUNNING,
+            locked_until=timezone.now() - timedelta(seconds=1),
+        )
+        tasks.run_pending()
+        self.assertEqual(CALLS, ['lost'])
+
+    def test_running_task_is_not_taken_twice(self):
+        record.delay('busy')
+        Task.objects.update(
+            state=Task.RUNNING,
+            locked_until=timezone.now() + timedelta(minutes=5),
+        )
+        tasks.run_pending()
+        self.assertEqual(CALLS, [])
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica1'], REPLICA_VIEWS=('posts:index',)
+)
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = ReplicaMiddleware(lambda request: HttpResponse())
+        self.router = replicas.ReplicaRouter()
+        self.aliases = []
+        replicas._health.clear()
+
+    def tearDown(self):
+        replicas.use(None)
+        replicas._health.clear()
+
+    def view(self, request):
+        self.aliases.append(self.router.db_for_read(None))
+        return HttpResponse()
+
+    def process(self, request, view_name='posts:index', view=None):
+        request.resolver_match = mock.Mock(view_name=view_name)
+        with mock.patch.object(replicas, 'is_healthy', return_value=True):
+            return self.middleware.process_view(
+                request, view or self.view, (), {}
+            )
+
+    def test_read_views_use_replica(self):
+        """Страницы из REPLICA_VIEWS читают из реплики, запись - в основную."""
+        self.process(self.factory.get('/'))
+        self.assertEqual(self.aliases, ['replica1'])
+        self.assertEqual(self.router.db_for_write(None), 'default')
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+
+    def test_other_requests_use_primary(self):
+        self.assertIsNone(self.process(self.factory.post('/')))
+        self.assertIsNone(
+            self.process(self.factory.get('/create/'), 'posts:post_create')
+        )
+        self.assertEqual(self.router.db_for_read(None), 'default')
+
+    def test_client_reads_own_writes(self):
+        """После изменения клиент какое-то время читает из основной базы."""
+        def write(request):
+            Task.objects.create(name='write', payload='{}', max_attempts=1)
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(write)
+        # Подписка меняет данные запросом GET
+        response = middleware(self.factory.get('/follow/'))
+        cookie = response.cookies[settings.REPLICA_STICKY_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_STICKY_SECONDS)
+        request = self.factory.get('/')
+        request.COOKIES[settings.REPLICA_STICKY_COOKIE] = '1'
+        self.assertIsNone(self.process(request))
+
+    def test_reads_do_not_stick_to_primary(self):
+        def read(request):
+            list(Task.objects.all())
+            return HttpResponse()
+
+        for request in (self.factory.get('/'), self.factory.post('/')):
+            response = ReplicaMiddleware(read)(request)
+            self.assertNotIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+
+    def test_failed_replica_falls_back_to_primary(self):
+        """При ошибке реплики страница строится из основной базы."""
+        def view(request):
+            alias = self.router.db_for_read(None)
+            self.aliases.append(alias)
+            if alias == 'replica1':
+                raise OperationalError('Реплика отключена')
+            return HttpResponse()
+
+        with self.assertLogs('core.replicas', 'WARNING'):
+            response = self.process(self.factory.get('/'), view=view)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.aliases, ['replica1', 'default'])
+        self.assertFalse(replicas.is_healthy('replica1'))
+        self.assertIsNone(replicas.choose())
+
+    def test_cache_misses_are_built_on_primary(self):
+        """Значение для общего кэша читается из основной базы."""
+        def compute():
+            self.aliases.append(self.router.db_for_read(None))
+            return 'value'
+
+        replicas.use('replica1')
+        get_or_compute('replica_miss', compute, 60)
+        self.assertEqual(self.aliases, ['default'])
+        self.assertEqual(self.router.db_for_read(None), 'replica1')
+
+    def test_replica_pages_are_not_cached(self):
+        """Страница из реплики не попадает в кэш страниц и ETag."""
+        def view(request):
+            request.page_cache_versions = {'feed_version:index': 1}
+            return HttpResponse('Страница')
+
+        cache.clear()
+        request = self.factory.get('/')
+        request.user = mock.Mock(pk=None, is_authenticated=False)
+        request.replica = 'replica1'
+        with override_settings(PAGE_CACHE_TIMEOUT=60):
+            AnonymousPageCacheMiddleware(view)(request)
+            response = ConditionalPageMiddleware(view)(request)
+        self.assertNotIn('ETag', response)
+        self.assertEqual(cache.get_many([
+            'page:' + _url_hash(request),
+            f'page_versions:{_url_hash(request)}:0',
+        ]), {})
+
+    def test_unknown_replica_is_unhealthy(self):
+        with self.assertLogs('core.replicas', 'WARNING'):
+            self.assertFalse(replicas.is_healthy('replica1'))
+        self.assertTrue(replicas.is_healthy('default'))
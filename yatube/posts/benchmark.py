@@ -0,0 +1,197 @@
+import math
+import subprocess
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import resolve, reverse
+
+from core import budgets, instrumentation
+
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+PERCENTILES = (50, 90, 95, 99)
+# Номер страницы для проверки глубокой постраничной навигации
+DEEP_PAGE = 50
+
+
+def percentile(values, rank):
+    """Процентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    position = max(math.ceil(rank / 100 * len(ordered)) - 1, 0)
+    return ordered[position]
+
+
+def _targets():
+    """Самые тяжелые объекты базы: по ним проверяются страницы."""
+    group = Group.objects.order_by('-posts_count', 'pk').first()
+    author = User.objects.order_by('-stats__posts_count', 'pk').first()
+    post = Post.objects.order_by('-comments_count', '-pk').first()
+    reader = (
+        Follow.objects.values('user').annotate(total=Count('pk'))
+        .order_by('-total', 'user').values_list('user', flat=True).first()
+    )
+    word = None
+    if post is not None:
+        words = [word for word in post.text.split() if len(word) > 3]
+        word = words[0] if words else None
+    return {
+        'group': group,
+        'author': author,
+        'post': post,
+        'reader': User.objects.filter(pk=reader).first(),
+        'word': word,
+    }
+
+
+def scenarios():
+    """Сценарии: имя, адрес, параметры запроса и пользователь."""
+    targets = _targets()
+    result = [
+        ('index', reverse('posts:index'), {}, None),
+        ('index_deep', reverse('posts:index'), {'page': DEEP_PAGE}, None),
+    ]
+    if targets['group'] is not None:
+        url = reverse('posts:group_list', args=[targets['group'].slug])
+        result += [
+            ('group_list', url, {}, None),
+            ('group_list_deep', url, {'page': DEEP_PAGE}, None),
+        ]
+    if targets['author'] is not None:
+        url = reverse('posts:profile', args=[targets['author'].username])
+        result.append(('profile', url, {}, None))
+    if targets['post'] is not None:
+        url = reverse('posts:post_detail', args=[targets['post'].pk])
+        result.append(('post_detail', url, {}, None))
+    if targets['reader'] is not None:
+        url = reverse('posts:follow_index')
+        result.append(('follow_index', url, {}, targets['reader']))
+    if targets['word'] is not None:
+        url = reverse('posts:search')
+        result.append(('search', url, {'q': targets['word']}, None))
+    return result
+
+
+def summarize(samples):
+    durations = [sample.duration * 1000 for sample in samples]
+    queries = [sample.queries for sample in samples]
+    summary = {
+        f'p{rank}_ms': round(percentile(durations, rank), 3)
+        for rank in PERCENTILES
+    }
+    summary.update({
+        'mean_ms': round(sum(durations) / len(durations), 3),
+        'max_ms': round(max(durations), 3),
+        'queries_mean': round(sum(queries) / len(queries), 2),
+        'queries_max': max(queries),
+        'sql_mean_ms': round(
+            sum(sample.sql_time for sample in samples) * 1000 / len(samples),
+            3
+        ),
+        'template_mean_ms': round(
+            sum(sample.template_time for sample in samples) * 1000
+            / len(samples), 3
+        ),
+        'cache_hits': sum(sample.cache_hits for sample in samples),
+        'cache_misses': sum(sample.cache_misses for sample in samples),
+    })
+    return summary
+
+
+def measure(client, url, params):
+    with instrumentation.collect() as metrics:
+        with connection.execute_wrapper(instrumentation.query_wrapper):
+            response = client.get(url, params)
+    return response.status_code, metrics
+
+
+def run(requests=50, warmup=5, cold=False, only=None):
+    """Прогоняет сценарии через тестовый клиент и возвращает сводку.
+
+    При ``cold`` кэш очищается перед каждым запросом. В ``over_budget``
+    попадают превышения QUERY_BUDGETS по p95 и наибольшему числу запросов.
+    """
+    instrumentation.install()
+    results = {}
+    hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+    with override_settings(ALLOWED_HOSTS=hosts):
+        for name, url, params, user in scenarios():
+            if only and name not in only:
+                continue
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            for _ in range(warmup):
+                client.get(url, params)
+            samples, statuses = [], {}
+            for _ in range(requests):
+                if cold:
+                    cache.clear()
+                status, metrics = measure(client, url, params)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                samples.append(metrics)
+            summary = summarize(samples)
+            view_name = resolve(url).view_name
+            results[name] = {
+                'url': url,
+                'view': view_name,
+                'params': params,
+                'statuses': statuses,
+                **summary,
+                'over_budget': budgets.violations(
+                    view_name, summary['queries_max'], summary['p95_ms']
+                ),
+            }
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(results, label='', **options):
+    return {
+        'label': label,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'dataset': {
+            'users': User.objects.count(),
+            'groups': Group.objects.count(),
+            'posts': Post.objects.count(),
+            'comments': Comment.objects.count(),
+            'follows': Follow.objects.count(),
+        },
+        'options': options,
+        'scenarios': results,
+    }
+
+
+def compare(previous, current, metric='p95_ms'):
+    """Строки с изменением метрики по сравнению с прошлым прогоном."""
+    lines = []
+    for name, result in current['scenarios'].items():
+        before = previous['scenarios'].get(name, {}).get(metric)
+        after = result[metric]
+        if not before:
+            lines.append(f'{name}: {metric} {after} (новый сценарий)')
+            continue
+        change = (after - before) / before * 100
+        lines.append(
+            f'{name}: {metric} {before} -> {after} ({change:+.1f}%)'
+        )
+    return lines
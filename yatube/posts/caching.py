@@ -0,0 +1,182 @@
+import random
+import time
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.template.loader import render_to_string
+
+from core import kvstore, replicas
+from core.caching import get_or_compute
+from yatube.settings import FEED_CACHE_TIMEOUT, POST_THUMBNAILS
+
+from .utils import CursorPaginator
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+
+
+def _version_key(scope, pk=None):
+    if pk is None:
+        return f'feed_version:{scope}'
+    return f'feed_version:{scope}:{pk}'
+
+
+def get_version(scope, pk=None):
+    """Текущая версия ленты; меняется при любом изменении ее содержимого.
+
+    Начальное значение берется из часов, чтобы после вытеснения ключа
+    версия не совпала с одной из уже использованных.
+    """
+    key = _version_key(scope, pk)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(scope, pk=None):
+    key = _version_key(scope, pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), None)
+
+
+def bump_versions(scope, pks, batch_size=1000):
+    """Меняет версии многих записей ``scope`` пачками ``set_many``.
+
+    Версии сравниваются только на равенство, поэтому вместо увеличения
+    каждой записи ставится новое случайное значение.
+    """
+    batch = {}
+    for pk in pks:
+        batch[_version_key(scope, pk)] = random.getrandbits(62)
+        if len(batch) == batch_size:
+            cache.set_many(batch, None)
+            batch = {}
+    if batch:
+        cache.set_many(batch, None)
+
+
+def depend_on(request, scope, pk=None):
+    """Отмечает, что страница зависит от версии ``scope``.
+
+    По отмеченным версиям AnonymousPageCacheMiddleware проверяет, не
+    устарела ли сохраненная копия страницы.
+    """
+    version = get_version(scope, pk)
+    if not hasattr(request, 'page_cache_versions'):
+        request.page_cache_versions = {}
+    request.page_cache_versions[_version_key(scope, pk)] = version
+    return version
+
+
+def _versions(request, scopes):
+    keys = {_version_key(*scope): scope for scope in scopes}
+    versions = cache.get_many(list(keys))
+    for key, scope in keys.items():
+        if key not in versions:
+            versions[key] = get_version(*scope)
+    if request is not None:
+        if not hasattr(request, 'page_cache_versions'):
+            request.page_cache_versions = {}
+        request.page_cache_versions.update(versions)
+    return versions
+
+
+def depend_on_many(request, scope, pks):
+    """Как ``depend_on`` для нескольких записей, одним обращением к кэшу."""
+    _versions(request, {(scope, pk) for pk in pks})
+
+
+def page_snapshot(page):
+    """Записи страницы и состояние пагинатора без исходного запроса."""
+    paginator = page.paginator
+    if getattr(paginator, 'is_keyset', False):
+        state = {
+            'keys': paginator.keys,
+            'next_cursor': paginator.next_cursor,
+            'previous_cursor': paginator.previous_cursor,
+        }
+    else:
+        state = {'count': paginator.count}
+    return list(page.object_list), page.number, paginator.per_page, state
+
+
+def restore_page(snapshot):
+    items, number, per_page, state = snapshot
+    if 'keys' in state:
+        paginator = CursorPaginator([], per_page, state['keys'])
+        paginator.next_cursor = state['next_cursor']
+        paginator.previous_cursor = state['previous_cursor']
+    else:
+        paginator = Paginator([], per_page)
+        paginator.count = state['count']
+    return paginator._get_page(items, number, paginator)
+
+
+def feed_cache_context(request, build, scope, pk=None):
+    """Страница ленты из кэша и ключ ее фрагмента для ``{% stale_cache %}``.
+
+    ``build`` строит страницу, если ее нет в кэше. Ключ зависит от версии
+    ленты и от запрошенной страницы или курсора.
+    """
+    page = request.GET.get('page')
+    position = f'page:{page}' if page else (
+        f'cursor:{request.GET.get("cursor", "")}'
+    )
+    cache_key = f'{depend_on(request, scope, pk)}:{position}'
+    snapshot = get_or_compute(
+        f'feed_page:{scope}:{pk}:{cache_key}',
+        lambda: page_snapshot(build()),
+        FEED_CACHE_TIMEOUT,
+    )
+    return {
+        'page_obj': restore_page(snapshot),
+        'cache_timeout': FEED_CACHE_TIMEOUT,
+        'cache_key': cache_key,
+    }
+
+
+def post_cards(posts):
+    """Разметка карточек постов.
+
+    Карточка зависит только от версий карточки поста, автора и группы,
+    поэтому рендерится один раз и берется из кэша во всех лентах, где пост
+    встречается. Комментарии меняют версию ``post`` страницы поста, но не
+    версию карточки.
+    """
+    posts = list(posts)
+    scopes = set()
+    for post in posts:
+        scopes |= {('post_card', post.pk), ('author', post.author_id)}
+        if post.group_id is not None:
+            scopes.add(('group_info', post.group_id))
+    versions = _versions(None, scopes)
+    keys = [
+        ':'.join(map(str, (
+            'post_card', post.pk,
+            versions[_version_key('post_card', post.pk)],
+            versions[_version_key('author', post.author_id)],
+            versions.get(_version_key('group_info', post.group_id), '-'),
+        )))
+        for post in posts
+    ]
+    cards = cache.get_many(keys)
+    stale = [(key, post) for key, post in zip(keys, posts) if key not in cards]
+    # Миниатюры нужны только картинкам, для которых еще нет копий
+    images = [
+        post.image for _, post in stale
+        if post.image and not post.image_variants
+    ]
+    with kvstore.prefetched(images, POST_THUMBNAILS):
+        missing = {
+            key: render_to_string(CARD_TEMPLATE, {'post': post})
+            for key, post in stale
+        }
+    # Посты из реплики могут отставать от версий, карточки из них только
+    # выводятся
+    if missing and replicas.current() is None:
+        cache.set_many(missing, FEED_CACHE_TIMEOUT)
+    cards.update(missing)
+    return [cards[key] for key in keys]
@@ -0,0 +1,181 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import AuthorStats, Comment, Follow, Group, ImageBlob, Post
+
+User = get_user_model()
+
+AUTHOR_COUNTERS = (
+    'posts_count', 'comments_count', 'followers_count', 'following_count'
+)
+
+# Пользователи, которых удаляют в этом потоке: каскад удаляет их посты,
+# комментарии и подписки, а счетчики самих удаляемых менять незачем
+_deleting = threading.local()
+
+
+def _deleting_users():
+    if not hasattr(_deleting, 'user_ids'):
+        _deleting.user_ids = set()
+    return _deleting.user_ids
+
+
+def user_deleting(user_id):
+    _deleting_users().add(user_id)
+
+
+def user_deleted(user_id):
+    _deleting_users().discard(user_id)
+
+
+def _deltas(**changes):
+    # Уменьшение не опускает счетчик ниже нуля, даже если он отстал
+    return {
+        field: F(field) + change if change > 0
+        else Greatest(F(field) + change, Value(0))
+        for field, change in changes.items() if change
+    }
+
+
+def change_author(user_id, **changes):
+    if user_id is None or user_id in _deleting_users():
+        return
+    updated = AuthorStats.objects.filter(user_id=user_id).update(
+        **_deltas(**changes)
+    )
+    # Строку счетчиков создает только увеличение: уменьшать в ней нечего
+    if not updated and any(change > 0 for change in changes.values()):
+        AuthorStats.objects.get_or_create(user_id=user_id)
+        AuthorStats.objects.filter(user_id=user_id).update(
+            **_deltas(**changes)
+        )
+
+
+def change_group(group_id, posts_count):
+    if group_id is not None:
+        Group.objects.filter(pk=group_id).update(
+            **_deltas(posts_count=posts_count)
+        )
+
+
+def change_post(post_id, comments_count):
+    Post.objects.filter(pk=post_id).update(
+        **_deltas(comments_count=comments_count)
+    )
+
+
+def change_image(name, posts_count):
+    if not name:
+        return
+    blobs = ImageBlob.objects.filter(name=name)
+    if posts_count < 0:
+        blobs.filter(posts_count__gte=-posts_count).update(
+            **_deltas(posts_count=posts_count)
+        )
+        return
+    if not blobs.update(**_deltas(posts_count=posts_count)):
+        ImageBlob.objects.get_or_create(name=name)
+        blobs.update(**_deltas(posts_count=posts_count))
+
+
+def author_stats(author):
+    """Счетчики автора; для автора без записей все счетчики равны нулю."""
+    try:
+        return author.stats
+    except AuthorStats.DoesNotExist:
+        return AuthorStats(user=author)
+
+
+def _count(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        Value(0),
+    )
+
+
+def _batches(queryset, batch_size):
+    ids = queryset.order_by('pk').values_list('pk', flat=True)
+    last_id = 0
+    while True:
+        batch = list(ids.filter(pk__gt=last_id)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]
+
+
+def _recount(model, field, source, source_field, batch_size):
+    for batch in _batches(model.objects.all(), batch_size):
+        objects = model.objects.filter(pk__in=batch).annotate(
+            actual=_count(source, source_field)
+        ).only('pk', field)
+        changed = []
+        for obj in objects:
+            if getattr(obj, field) != obj.actual:
+                setattr(obj, field, obj.actual)
+                changed.append(obj)
+        model.objects.bulk_update(changed, [field])
+
+
+def recount_posts(batch_size):
+    _recount(Post, 'comments_count', Comment.objects.all(), 'post',
+             batch_size)
+
+
+def recount_groups(batch_size):
+    _recount(Group, 'posts_count', Post.objects.all(), 'group', batch_size)
+
+
+def recount_authors(batch_size):
+    for batch in _batches(User.objects.all(), batch_size):
+        rows = User.objects.filter(pk__in=batch).annotate(
+            posts_count=_count(Post.objects.all(), 'author'),
+            comments_count=_count(Comment.objects.all(), 'author'),
+            followers_count=_count(Follow.objects.all(), 'author'),
+            following_count=_count(Follow.objects.all(), 'user'),
+        ).values('pk', *AUTHOR_COUNTERS)
+        existing = AuthorStats.objects.in_bulk(batch)
+        changed, missing = [], []
+        for row in rows:
+            stats = existing.get(row['pk'])
+            actual = {field: row[field] for field in AUTHOR_COUNTERS}
+            if stats is None:
+                if any(actual.values()):
+                    missing.append(AuthorStats(user_id=row['pk'], **actual))
+                continue
+            if any(getattr(stats, field) != value
+                   for field, value in actual.items()):
+                for field, value in actual.items():
+                    setattr(stats, field, value)
+                changed.append(stats)
+        AuthorStats.objects.bulk_update(changed, AUTHOR_COUNTERS)
+        AuthorStats.objects.bulk_create(missing)
+
+
+def recount_images(batch_size):
+    actual = dict(
+        Post.objects.exclude(image='').order_by().values_list('image')
+        .annotate(total=Count('pk'))
+    )
+    for batch in _batches(ImageBlob.objects.all(), batch_size):
+        changed = []
+        for blob in ImageBlob.objects.filter(pk__in=batch):
+            posts_count = actual.pop(blob.name, 0)
+            if blob.posts_count != posts_count:
+                blob.posts_count = posts_count
+                changed.append(blob)
+        ImageBlob.objects.bulk_update(changed, ['posts_count'])
+    ImageBlob.objects.bulk_create(
+        [ImageBlob(name=name, posts_count=total)
+         for name, total in actual.items()],
+        batch_size=batch_size, ignore_conflicts=True,
+    )
@@ -0,0 +1,130 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from yatube.settings import EXPORT_CHUNK_SIZE
+
+from .models import Comment, Follow, Group, Post
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+class Dataset:
+    """Выгружаемая таблица: поля, поле даты и путь к слагу группы.
+
+    Фильтр, для которого поле не указано, к таблице не применяется.
+    """
+
+    def __init__(self, model, fields, date_field=None, group_field=None):
+        self.model = model
+        self.fields = fields
+        self.date_field = date_field
+        self.group_field = group_field
+
+    @property
+    def columns(self):
+        return [field.replace('__', '_') for field in self.fields]
+
+
+DATASETS = {
+    'posts': Dataset(
+        Post,
+        ('id', 'pub_date', 'author_id', 'author__username', 'group_id',
+         'group__slug', 'text', 'image', 'comments_count'),
+        date_field='pub_date', group_field='group__slug',
+    ),
+    'comments': Dataset(
+        Comment,
+        ('id', 'created', 'post_id', 'author_id', 'author__username',
+         'text'),
+        date_field='created', group_field='post__group__slug',
+    ),
+    'groups': Dataset(
+        Group,
+        ('id', 'slug', 'title', 'description', 'posts_count'),
+        group_field='slug',
+    ),
+    'follows': Dataset(
+        Follow,
+        ('id', 'user_id', 'user__username', 'author_id',
+         'author__username'),
+    ),
+}
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def rows(dataset, after=None, since=None, until=None, group=None,
+         chunk_size=EXPORT_CHUNK_SIZE):
+    """Строки таблицы по возрастанию id, порциями по ``chunk_size``.
+
+    Каждая порция - отдельный запрос ``id > последний id``, поэтому
+    память не зависит от размера таблицы, а прерванную выгрузку можно
+    продолжить с ``after`` - последнего выгруженного id. Даты ``since``
+    и ``until`` включаются в выгрузку.
+    """
+    dataset = DATASETS[dataset]
+    queryset = dataset.model.objects.order_by('id')
+    if dataset.date_field is not None:
+        if since is not None:
+            queryset = queryset.filter(
+                **{f'{dataset.date_field}__gte': _start_of(since)}
+            )
+        if until is not None:
+            queryset = queryset.filter(**{
+                f'{dataset.date_field}__lt':
+                    _start_of(until + timedelta(days=1))
+            })
+    if dataset.group_field is not None and group is not None:
+        queryset = queryset.filter(**{dataset.group_field: group})
+    queryset = queryset.values_list(*dataset.fields)
+    last = after or 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last)[:chunk_size])
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        last = chunk[-1][0]
+
+
+class _Echo:
+    """Буфер для ``csv.writer``, который возвращает строку, а не пишет."""
+
+    def write(self, value):
+        return value
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def ndjson_lines(columns, rows):
+    for row in rows:
+        yield json.dumps(
+            dict(zip(columns, map(_plain, row))), ensure_ascii=False
+        ) + '\n'
+
+
+def csv_lines(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_plain(value) for value in row])
+
+
+def lines(dataset, file_format='ndjson', **filters):
+    """Строки выгрузки в формате ``file_format`` по одной."""
+    columns = DATASETS[dataset].columns
+    selected = rows(dataset, **filters)
+    if file_format == 'csv':
+        return csv_lines(columns, selected)
+    return ndjson_lines(columns, selected)
@@ -0,0 +1,165 @@
+from django.conf import settings
+from django.db.models import F, Q
+
+from core.tasks import task
+
+from .caching import bump_version, bump_versions
+from .models import AuthorStats, FeedEntry, Follow, Post
+
+# Ключ курсора для материализованной ленты: поля записи ленты,
+# по которым построен индекс (user, -pub_date, -post)
+FEED_ENTRY_KEYS = ('feed_date', 'feed_post')
+
+
+def is_materialized():
+    return settings.FOLLOW_FEED_MATERIALIZED
+
+
+def is_popular(author_id):
+    """Посты авторов с огромным числом подписчиков не раскладываются.
+
+    Число подписчиков берется из счетчиков автора, а не считается.
+    """
+    return AuthorStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.FOLLOW_FEED_FANOUT_LIMIT,
+    ).exists()
+
+
+def popular_authors(user):
+    return Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gt=settings.FOLLOW_FEED_FANOUT_LIMIT,
+    ).values_list('author_id', flat=True)
+
+
+def invalidate_author(author_id):
+    """Сбрасывает профиль автора и ленты подписок его читателей.
+
+    Лента подписок зависит от одной версии ``follow_feed`` читателя, ее
+    меняет каждый пост, правка и подписка. Читатели популярных авторов
+    вместо этого зависят от версии профиля такого автора.
+    """
+    bump_version('profile', author_id)
+    if is_popular(author_id):
+        return
+    followers = Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True
+    )
+    bump_versions(
+        'follow_feed', followers.iterator(),
+        settings.FOLLOW_FEED_BATCH_SIZE,
+    )
+
+
+def follow_feed(user, popular=None):
+    """Лента подписок пользователя и ключ курсора для ее страниц.
+
+    Без материализации лента собирается соединением с ``Follow``.
+    С материализацией страница читается диапазоном индекса записей
+    ленты; посты популярных авторов добавляются при чтении. ``popular`` -
+    уже выбранные ``popular_authors``.
+    """
+    posts = Post.objects.feed()
+    if not is_materialized():
+        return posts.filter(author__following__user=user), ('pub_date', 'id')
+    if popular is None:
+        popular = list(popular_authors(user))
+    if popular:
+        entries = FeedEntry.objects.filter(user=user).values('post_id')
+        return posts.filter(
+            Q(pk__in=entries) | Q(author_id__in=popular)
+        ), ('pub_date', 'id')
+    return posts.filter(feed_entries__user=user).annotate(
+        feed_date=F('feed_entries__pub_date'),
+        feed_post=F('feed_entries__post_id'),
+    ), FEED_ENTRY_KEYS
+
+
+def fan_out(post):
+    if is_popular(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True
+    )
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for user_id in followers.iterator()
+        ),
+        batch_size=settings.FOLLOW_FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    if is_popular(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('pk', 'pub_date')[:settings.FOLLOW_FEED_BACKFILL_SIZE]
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, pub_date in posts
+        ),
+        batch_size=settings.FOLLOW_FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def clean_up(user_id, author_id):
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def sync_follow(user_id, author_id):
+    """Приводит ленту к текущему состоянию подписки.
+
+    Задачи подписки и отписки выполняются в разных процессах и могут
+    поменяться местами, поэтому решает не событие, а наличие ``Follow``:
+    есть подписка - лента дополняется, нет - посты автора удаляются.
+    Вызывается внутри транзакции; ``select_for_update`` не дает удалить
+    подписку между проверкой и вставкой.
+    """
+    following = Follow.objects.select_for_update().filter(
+        user_id=user_id, author_id=author_id
+    ).exists()
+    if following:
+        backfill(user_id, author_id)
+    else:
+        clean_up(user_id, author_id)
+
+
+# Задачи очереди: ленты подписчиков заполняются после ответа, затем
+# сбрасываются версии, от которых зависит страница подписок
+
+
+@task(lane='low')
+def post_published(post_id):
+    post = Post.objects.filter(pk=post_id).only('author', 'pub_date').first()
+    if post is None:
+        return
+    fan_out(post)
+    invalidate_author(post.author_id)
+
+
+@task(lane='low')
+def follow_added(user_id, author_id):
+    sync_follow(user_id, author_id)
+    bump_version('stats', user_id)
+
+
+@task(lane='low')
+def follow_removed(user_id, author_id):
+    sync_follow(user_id, author_id)
+    bump_version('stats', user_id)
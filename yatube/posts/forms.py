@@ -1,6 +1,11 @@
 from django import forms
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import UploadedFile
 
-from .models import Post, Comment
+from . import export, images
+from .models import Group, Post, Comment
+
+User = get_user_model()
 
 
 class PostForm(forms.ModelForm):
@@ -16,6 +21,12 @@ class PostForm(forms.ModelForm):
             'group': ('Группа, к которой будет относиться пост')
         }
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            return images.clean_upload(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -27,3 +38,58 @@ class CommentForm(forms.ModelForm):
         help_texts = {
             'text': 'Текст нового комментария',
         }
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Запрос', max_length=200, required=False)
+    group = forms.ModelChoiceField(
+        queryset=Group.objects.all(),
+        to_field_name='slug',
+        required=False,
+        label='Группа',
+    )
+    author = forms.CharField(label='Автор', max_length=150, required=False)
+
+    def clean_author(self):
+        username = self.cleaned_data['author']
+        if not username:
+            return None
+        try:
+            return User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise forms.ValidationError('Такого автора нет')
+
+
+class ExportForm(forms.Form):
+    format = forms.ChoiceField(
+        label='Формат',
+        choices=[(name, name) for name in export.FORMATS],
+        required=False,
+    )
+    since = forms.DateField(label='С даты', required=False)
+    until = forms.DateField(label='По дату', required=False)
+    group = forms.SlugField(label='Слаг группы', required=False)
+    after = forms.IntegerField(
+        label='После id', min_value=0, required=False,
+        help_text='Последний выгруженный id, чтобы продолжить выгрузку'
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        since, until = cleaned_data.get('since'), cleaned_data.get('until')
+        if since and until and since > until:
+            raise forms.ValidationError('Начальная дата позже конечной')
+        return cleaned_data
+
+    def error_text(self):
+        return '; '.join(
+            message for messages in self.errors.values()
+            for message in messages
+        )
+
+    def filters(self):
+        """Фильтры для ``export.rows``; пустые поля не фильтруют."""
+        return {
+            name: self.cleaned_data[name] or None
+            for name in ('after', 'since', 'until', 'group')
+        }
@@ -0,0 +1,61 @@
+import json
+
+from django.core.files.storage import default_storage
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from .images import VARIANTS_DIR
+from .models import ImageBlob, Post
+from .storage import blob_names
+
+
+def _image_field():
+    return Post._meta.get_field('image')
+
+
+def _is_old(storage, name, cutoff):
+    # Свежий файл может принадлежать посту, который еще сохраняется
+    return storage.get_modified_time(name) < cutoff
+
+
+def unreferenced_images(cutoff):
+    """Картинки без постов, не менявшиеся с ``cutoff``."""
+    field = _image_field()
+    referenced = set(
+        ImageBlob.objects.filter(posts_count__gt=0)
+        .values_list('name', flat=True)
+    )
+    for name in blob_names(field.storage, field.upload_to.rstrip('/')):
+        if name in referenced or not _is_old(field.storage, name, cutoff):
+            continue
+        # Счетчик мог разойтись с постами после массового обновления
+        if Post.objects.filter(image=name).exists():
+            continue
+        yield name
+
+
+def unreferenced_variants(cutoff):
+    """Копии картинок, которых нет ни в одном ``Post.image_variants``."""
+    referenced = set()
+    manifests = (
+        Post.objects.exclude(image_variants='')
+        .values_list('image_variants', flat=True)
+    )
+    for variants in manifests.iterator():
+        for source in json.loads(variants).get('sources', []):
+            referenced.update(name for _, name in source['files'])
+    for name in blob_names(default_storage, VARIANTS_DIR):
+        if name not in referenced and _is_old(default_storage, name, cutoff):
+            yield name
+
+
+def delete_image(name):
+    """Удаляет картинку вместе с миниатюрами sorl и счетчиком."""
+    storage = _image_field().storage
+    default.kvstore.delete(ImageFile(name, storage))
+    storage.delete(name)
+    ImageBlob.objects.filter(name=name, posts_count=0).delete()
+
+
+def delete_variant(name):
+    default_storage.delete(name)
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import logging
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps, features
+
+from .storage import blob_name
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'posts/variants'
+
+# Формат сохранения: расширение, MIME-тип и параметры кодирования
+FORMATS = {
+    'WEBP': ('webp', 'image/webp', {'quality': 80, 'method': 4}),
+    'JPEG': ('jpg', 'image/jpeg',
+             {'quality': 85, 'optimize': True, 'progressive': True}),
+    'PNG': ('png', 'image/png', {'optimize': True}),
+}
+# Метаданные, которые не должны попасть в опубликованную картинку
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment')
+ORIENTATION = 0x0112
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+def check_pixels(image):
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ImageTooLarge(f'{width}x{height}')
+
+
+def has_metadata(image):
+    return any(key in image.info for key in METADATA_KEYS)
+
+
+def clean_upload(file_):
+    """Проверяет размер загруженной картинки и удаляет из нее EXIF.
+
+    Размер читается из заголовка, картинка при этом не раскодируется.
+    Файл без метаданных возвращается как есть, иначе картинка
+    поворачивается по EXIF и сохраняется заново в том же формате.
+    """
+    file_.seek(0)
+    image = Image.open(file_)
+    try:
+        check_pixels(image)
+    except ImageTooLarge:
+        limit = settings.POST_IMAGE_MAX_PIXELS / 1_000_000
+        raise ValidationError(
+            f'Картинка больше {limit:g} мегапикселей',
+            code='image_too_large',
+        )
+    if not has_metadata(image):
+        file_.seek(0)
+        return file_
+    image_format = image.format
+    options = {}
+    if 'icc_profile' in image.info:
+        options['icc_profile'] = image.info['icc_profile']
+    if image.getexif().get(ORIENTATION, 1) != 1:
+        image = ImageOps.exif_transpose(image)
+        if image_format == 'JPEG':
+            options['quality'] = 95
+    elif image_format == 'JPEG':
+        # Без поворота JPEG сохраняется с исходными таблицами квантования
+        options.update(quality='keep', subsampling='keep')
+    buffer = BytesIO()
+    # EXIF сохраняется, только если передать его явно
+    image.save(buffer, image_format, **options)
+    return SimpleUploadedFile(
+        file_.name, buffer.getvalue(), getattr(file_, 'content_type', None)
+    )
+
+
+def output_formats(source_format):
+    """WebP, если Pillow его поддерживает, и исходный формат.
+
+    Форматы, кроме JPEG и WebP, сохраняются в PNG.
+    """
+    fallback = source_format if source_format in FORMATS else 'PNG'
+    if fallback != 'WEBP' and features.check('webp'):
+        return ['WEBP', fallback]
+    return [fallback]
+
+
+def target_sizes(source_width):
+    """Размеры копий: ширины не больше исходной, пропорции как в ленте."""
+    full_width, full_height = settings.POST_IMAGE_SIZE
+    widths = [
+        width for width in settings.POST_IMAGE_WIDTHS
+        if width <= source_width
+    ] or [min(settings.POST_IMAGE_WIDTHS)]
+    return [
+        (width, round(width * full_height / full_width)) for width in widths
+    ]
+
+
+def content_name(data, extension):
+    """Имя по хэшу содержимого, разложенное по подкаталогам."""
+    return blob_name(
+        VARIANTS_DIR, hashlib.sha256(data).hexdigest(), f'.{extension}'
+    )
+
+
+def _encode(image, image_format):
+    extension, _, options = FORMATS[image_format]
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    data = buffer.getvalue()
+    name = content_name(data, extension)
+    if not default_storage.exists(name):
+        name = default_storage.save(name, SimpleUploadedFile(name, data))
+    return name
+
+
+def _prepare(image):
+    """Поворачивает картинку по EXIF и приводит к RGB или RGBA."""
+    # JPEG раскодируется сразу в уменьшенном масштабе; квадрат по большей
+    # ширине оставляет запас, если картинку придется повернуть
+    largest = max(settings.POST_IMAGE_WIDTHS)
+    image.draft('RGB', (largest, largest))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        has_alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    return image
+
+
+def build_variants(name, storage=default_storage):
+    """Копии картинки нескольких ширин в WebP и исходном формате.
+
+    Возвращает описание копий в JSON для ``Post.image_variants``. Копии
+    сохраняются без метаданных под именами по хэшу содержимого, поэтому
+    одинаковые картинки хранятся один раз. Картинка больше
+    POST_IMAGE_MAX_PIXELS не раскодируется, для нее описание пустое.
+    """
+    with storage.open(name) as file_:
+        image = Image.open(file_)
+        try:
+            check_pixels(image)
+        except ImageTooLarge as error:
+            logger.warning('Картинка %s слишком большая: %s', name, error)
+            return json.dumps({})
+        image_formats = output_formats(image.format)
+        image = _prepare(image)
+    sizes = target_sizes(image.width)
+    files = {image_format: [] for image_format in image_formats}
+    for size in sizes:
+        resized = ImageOps.fit(image, size, Image.LANCZOS)
+        for image_format in image_formats:
+            files[image_format].append(
+                (size[0], _encode(resized, image_format))
+            )
+    sources = [
+        {'type': FORMATS[image_format][1], 'files': files[image_format]}
+        for image_format in image_formats
+    ]
+    width, height = sizes[-1]
+    return json.dumps({'width': width, 'height': height, 'sources': sources})
+
+
+def picture(variants):
+    """Атрибуты тегов ``<source>`` и ``<img>`` из описания копий."""
+    manifest = json.loads(variants or '{}')
+    if not manifest.get('sources'):
+        return None
+    sources = [
+        {
+            'type': source['type'],
+            'srcset': ', '.join(
+                f'{default_storage.url(name)} {width}w'
+                for width, name in source['files']
+            ),
+        }
+        for source in manifest['sources']
+    ]
+    fallback = manifest['sources'][-1]['files']
+    return {
+        'sources': sources[:-1],
+        'srcset': sources[-1]['srcset'],
+        'src': default_storage.url(fallback[-1][1]),
+        'width': manifest['width'],
+        'height': manifest['height'],
+        'sizes': settings.POST_IMAGE_SIZES,
+    }
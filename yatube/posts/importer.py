@@ -0,0 +1,361 @@
+import csv
+import json
+import os
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters, feeds, search
+from .caching import bump_version
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+FORMATS = ('ndjson', 'csv')
+
+
+class ImportFailed(Exception):
+    pass
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    return 'ndjson' if extension in ('json', 'jsonl') else extension
+
+
+def _lines(file_):
+    """Строки файла с номерами; строка не в UTF-8 - ошибка с ее номером."""
+    for number, line in enumerate(file_, 1):
+        try:
+            yield number, line.decode('utf-8')
+        except UnicodeDecodeError as error:
+            yield number, error
+
+
+def read(path, file_format=None):
+    """Записи файла NDJSON или CSV по одной, без чтения файла целиком.
+
+    Колонки совпадают с колонками ``export``; пустые значения CSV
+    становятся None. Вместо битой строки NDJSON выдается ``ValueError``
+    с ее номером, ``Importer`` пропускает такие строки. В CSV запись
+    может занимать несколько строк, поэтому битая строка CSV
+    останавливает загрузку с ``ImportFailed``.
+    """
+    file_format = file_format or detect_format(path)
+    if file_format not in FORMATS:
+        raise ImportFailed(f'Неизвестный формат файла {path}')
+    with open(path, 'rb') as file_:
+        if file_format == 'csv':
+            yield from _read_csv(path, _lines(file_))
+            return
+        for number, line in _lines(file_):
+            if isinstance(line, ValueError):
+                yield ValueError(f'Строка {number}: {line}')
+                continue
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as error:
+                yield ValueError(f'Строка {number}: {error}')
+
+
+def _read_csv(path, lines):
+    def text():
+        for number, line in lines:
+            if isinstance(line, ValueError):
+                raise ImportFailed(f'{path}, строка {number}: {line}')
+            yield line
+
+    reader = csv.DictReader(text())
+    try:
+        for record in reader:
+            yield {key: value or None for key, value in record.items()}
+    except csv.Error as error:
+        raise ImportFailed(f'{path}, строка {reader.line_num}: {error}')
+
+
+@contextmanager
+def original_dates(*fields):
+    """Отключает ``auto_now_add``, чтобы сохранить даты из выгрузки.
+
+    ``bulk_create`` заполняет такие поля текущим временем, даже если
+    дата уже указана.
+    """
+    previous = [field.auto_now_add for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in zip(fields, previous):
+            field.auto_now_add = value
+
+
+def _date(value):
+    if value is None:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise ValueError(f'Неверная дата {value}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+class Importer:
+    """Загружает группы, посты, комментарии и подписки пачками.
+
+    Каждая пачка из ``batch_size`` записей вставляется одним
+    ``bulk_create`` в своей транзакции; сигналы не срабатывают. Авторов и
+    группы записи указывают по username и slug, они берутся из словарей в
+    памяти. Комментарии ссылаются на ``id`` постов из выгрузки, если посты
+    загружены в том же запуске, иначе - на посты yatube. Строки с
+    неизвестными ссылками пропускаются. После загрузки нужно вызвать
+    ``finish``: он пересчитывает счетчики и поисковый индекс и сбрасывает
+    версии затронутых страниц.
+    """
+
+    def __init__(self, batch_size=5000, create_users=False, stdout=None):
+        self.batch_size = batch_size
+        self.create_users = create_users
+        self.stdout = stdout
+        self.user_ids = None
+        self.group_ids = None
+        # id поста в выгрузке -> id поста в yatube
+        self.post_ids = {}
+        self.imported = {}
+        self.skipped = {}
+        self.versions = set()
+        self.search_paused = False
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def skip(self, model, reason):
+        name = model.__name__
+        self.skipped[name] = self.skipped.get(name, 0) + 1
+        if self.skipped[name] <= 10:
+            self.log(f'{name}: строка пропущена: {reason}')
+
+    def pause_search(self):
+        """Снимает триггеры поиска: индекс строится один раз в ``finish``."""
+        if search.is_available():
+            search.drop_triggers()
+            self.search_paused = True
+
+    def _batches(self, model, records, build):
+        batch = []
+        for record in records:
+            if isinstance(record, ValueError):
+                self.skip(model, record)
+                continue
+            try:
+                batch.append(build(record))
+            except (KeyError, TypeError, ValueError) as error:
+                self.skip(model, error)
+                continue
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _saved(self, model, count):
+        name = model.__name__
+        self.imported[name] = self.imported.get(name, 0) + count
+        self.log(f'{name}: загружено {self.imported[name]}')
+
+    def _load_users(self):
+        if self.user_ids is None:
+            self.user_ids = dict(User.objects.values_list('username', 'id'))
+
+    def _resolve_users(self, usernames):
+        """Создает недостающих пользователей, если это разрешено."""
+        self._load_users()
+        missing = {name for name in usernames if name not in self.user_ids}
+        if not missing or not self.create_users:
+            return
+        password = make_password(None)
+        User.objects.bulk_create(
+            [User(username=name, password=password) for name in missing],
+            ignore_conflicts=True,
+        )
+        self.user_ids.update(
+            User.objects.filter(username__in=missing)
+            .values_list('username', 'id')
+        )
+
+    def _user_id(self, username):
+        if username not in self.user_ids:
+            raise ValueError(f'Нет пользователя {username}')
+        return self.user_ids[username]
+
+    def groups(self, records):
+        def build(record):
+            return Group(
+                slug=record['slug'],
+                title=record['title'],
+                description=record.get('description') or '',
+            )
+
+        for batch in self._batches(Group, records, build):
+            with transaction.atomic():
+                Group.objects.bulk_create(batch, ignore_conflicts=True)
+            self._saved(Group, len(batch))
+        self.group_ids = None
+
+    def _group_id(self, slug):
+        if slug is None:
+            return None
+        if self.group_ids is None:
+            self.group_ids = dict(Group.objects.values_list('slug', 'id'))
+        if slug not in self.group_ids:
+            raise ValueError(f'Нет группы {slug}')
+        return self.group_ids[slug]
+
+    def posts(self, records):
+        def build(record):
+            source_id = record.get('id')
+            post = Post(
+                text=record['text'],
+                author_id=record['author_username'],
+                group_id=self._group_id(record.get('group_slug')),
+                pub_date=_date(record.get('pub_date')),
+            )
+            return source_id, post
+
+        pub_date = Post._meta.get_field('pub_date')
+        for batch in self._batches(Post, records, build):
+            posts = self._with_authors(Post, batch)
+            with original_dates(pub_date), transaction.atomic():
+                last = Post.objects.order_by('-pk').values_list(
+                    'pk', flat=True
+                ).first() or 0
+                Post.objects.bulk_create([post for _, post in posts])
+                new_ids = list(
+                    Post.objects.filter(pk__gt=last).order_by('pk')
+                    .values_list('pk', flat=True)
+                )
+                if len(new_ids) != len(posts):
+                    raise ImportFailed(
+                        'Во время загрузки посты добавлял кто-то еще'
+                    )
+            for (source_id, post), new_id in zip(posts, new_ids):
+                if source_id is not None:
+                    self.post_ids[int(source_id)] = new_id
+                self.versions.update({
+                    ('profile', post.author_id),
+                    ('stats', post.author_id),
+                    ('group', post.group_id),
+                })
+            self.versions.add(('index', None))
+            self._saved(Post, len(posts))
+
+    def _with_authors(self, model, batch, field='author_id'):
+        """Заменяет username в ``field`` на id; без автора строка пропадает.
+
+        Элементы пачки - объекты или кортежи, последний элемент которых
+        объект.
+        """
+        def obj(item):
+            return item[-1] if isinstance(item, tuple) else item
+
+        self._resolve_users({getattr(obj(item), field) for item in batch})
+        resolved = []
+        for item in batch:
+            try:
+                setattr(
+                    obj(item), field, self._user_id(getattr(obj(item), field))
+                )
+            except ValueError as error:
+                self.skip(model, error)
+                continue
+            resolved.append(item)
+        return resolved
+
+    def _existing_posts(self, post_ids):
+        if self.post_ids:
+            return {
+                post_id: self.post_ids[post_id]
+                for post_id in post_ids if post_id in self.post_ids
+            }
+        return {
+            post_id: post_id for post_id in
+            Post.objects.filter(pk__in=post_ids).values_list('pk', flat=True)
+        }
+
+    def comments(self, records):
+        def build(record):
+            return Comment(
+                post_id=int(record['post_id']),
+                author_id=record['author_username'],
+                text=record['text'],
+                created=_date(record.get('created')),
+            )
+
+        created = Comment._meta.get_field('created')
+        for batch in self._batches(Comment, records, build):
+            comments = self._with_authors(Comment, batch)
+            posts = self._existing_posts(
+                {comment.post_id for comment in comments}
+            )
+            resolved = []
+            for comment in comments:
+                if comment.post_id not in posts:
+                    self.skip(Comment, f'Нет поста {comment.post_id}')
+                    continue
+                comment.post_id = posts[comment.post_id]
+                resolved.append(comment)
+                self.versions.update({
+                    ('post', comment.post_id),
+                    ('stats', comment.author_id),
+                })
+            with original_dates(created), transaction.atomic():
+                Comment.objects.bulk_create(resolved)
+            self._saved(Comment, len(resolved))
+
+    def follows(self, records):
+        def build(record):
+            return Follow(
+                user_id=record['user_username'],
+                author_id=record['author_username'],
+            )
+
+        for batch in self._batches(Follow, records, build):
+            follows = self._with_authors(
+                Follow, self._with_authors(Follow, batch, 'user_id')
+            )
+            follows = [
+                follow for follow in follows
+                if follow.user_id != follow.author_id
+            ]
+            # Повторы отбрасывает ограничение follow_constraints
+            with transaction.atomic():
+                Follow.objects.bulk_create(follows, ignore_conflicts=True)
+            for follow in follows:
+                self.versions.update({
+                    ('stats', follow.user_id),
+                    ('stats', follow.author_id),
+                    ('follow_feed', follow.user_id),
+                })
+            self._saved(Follow, len(follows))
+
+    def finish(self):
+        """Пересчитывает данные, которые сигналы обновили бы по записи."""
+        counters.recount_posts(self.batch_size)
+        counters.recount_groups(self.batch_size)
+        counters.recount_authors(self.batch_size)
+        if self.search_paused:
+            search.install()
+            self.search_paused = False
+        for scope, pk in self.versions:
+            if scope == 'profile':
+                feeds.invalidate_author(pk)
+            elif scope != 'group' or pk is not None:
+                bump_version(scope, pk)
@@ -0,0 +1,74 @@
+import json
+import os
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время ответа и число SQL-запросов основных страниц '
+        'и сохраняет результат в JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Сколько замеренных запросов на сценарий'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=5,
+            help='Сколько запросов сделать до замеров'
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом'
+        )
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios',
+            help='Запустить только этот сценарий; можно повторять'
+        )
+        parser.add_argument('--label', default='', help='Подпись прогона')
+        parser.add_argument(
+            '--output', help='Файл результата, по умолчанию в benchmarks/'
+        )
+        parser.add_argument(
+            '--compare', help='Файл прошлого прогона для сравнения'
+        )
+
+    def handle(self, *args, **options):
+        results = benchmark.run(
+            options['requests'], options['warmup'], options['cold'],
+            options['scenarios'],
+        )
+        data = benchmark.report(
+            results, options['label'], requests=options['requests'],
+            warmup=options['warmup'], cold=options['cold'],
+        )
+        output = options['output'] or os.path.join(
+            settings.BASE_DIR, 'benchmarks',
+            f'{datetime.now():%Y%m%d-%H%M%S}.json'
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as file:
+            json.dump(data, file, ensure_ascii=False, indent=2)
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name}: p50 {result["p50_ms"]} мс, '
+                f'p95 {result["p95_ms"]} мс, '
+                f'p99 {result["p99_ms"]} мс, '
+                f'запросов к БД {result["queries_mean"]}'
+            )
+            for problem in result['over_budget']:
+                self.stdout.write(self.style.WARNING(
+                    f'{name}: превышен бюджет, {problem}'
+                ))
+        if options['compare']:
+            with open(options['compare']) as file:
+                previous = json.load(file)
+            for line in benchmark.compare(previous, data):
+                self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS(f'Результат сохранен в {output}'))
@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts import garbage
+
+
+class Command(BaseCommand):
+    help = 'Удаляет картинки и их копии, на которые не ссылается ни один пост'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=float, default=24,
+            help='Не трогать файлы, измененные за это число часов'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено'
+        )
+
+    def collect(self, names, delete, dry_run):
+        count = 0
+        for name in names:
+            if dry_run:
+                self.stdout.write(name)
+            else:
+                delete(name)
+            count += 1
+        return count
+
+    def handle(self, *args, grace_hours, dry_run, **options):
+        cutoff = timezone.now() - timedelta(hours=grace_hours)
+        images = self.collect(
+            garbage.unreferenced_images(cutoff), garbage.delete_image,
+            dry_run,
+        )
+        variants = self.collect(
+            garbage.unreferenced_variants(cutoff), garbage.delete_variant,
+            dry_run,
+        )
+        action = 'Будет удалено' if dry_run else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action}: картинок {images}, копий {variants}'
+        ))
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import query_plans
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN QUERY PLAN для запросов основных страниц '
+        'и отмечает полное чтение таблиц'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios',
+            help='Проверить только этот сценарий; можно повторять'
+        )
+        parser.add_argument(
+            '--ignore-table', action='append', dest='ignored', default=[],
+            help='Не отмечать полное чтение этой таблицы; можно повторять'
+        )
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='Завершиться с ошибкой, если найдено полное чтение'
+        )
+
+    def handle(self, *args, **options):
+        if not query_plans.is_available():
+            raise CommandError('Планы запросов разбираются только для SQLite')
+        verbose = options['verbosity'] > 1
+        ignored = set(options['ignored'])
+        flagged = 0
+        results = query_plans.check(options['scenarios'])
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name} ({result["view"]}): '
+                f'{len(result["queries"])} запросов, ответ {result["status"]}'
+            )
+            for query in result['queries']:
+                scans = [
+                    table for table in query['full_scans']
+                    if table not in ignored
+                ]
+                flagged += bool(scans)
+                if not scans and not verbose:
+                    continue
+                if scans:
+                    self.stdout.write(self.style.WARNING(
+                        f'  Полное чтение: {", ".join(scans)}'
+                    ))
+                elif query['temp_sort']:
+                    self.stdout.write('  Сортировка во временном B-дереве')
+                self.stdout.write(f'  {query["sql"]}')
+                for line in query['plan']:
+                    self.stdout.write(f'    {line}')
+        if flagged and options['strict']:
+            raise CommandError(f'Запросов с полным чтением: {flagged}')
+        style = self.style.WARNING if flagged else self.style.SUCCESS
+        self.stdout.write(style(f'Запросов с полным чтением: {flagged}'))
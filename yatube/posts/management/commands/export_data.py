@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.forms import ExportForm
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии, группы или подписки в NDJSON или '
+        'CSV порциями, не загружая таблицу в память'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(export.DATASETS))
+        parser.add_argument(
+            '--format', choices=list(export.FORMATS), default='ndjson'
+        )
+        parser.add_argument('--since', help='С даты ГГГГ-ММ-ДД')
+        parser.add_argument('--until', help='По дату ГГГГ-ММ-ДД включительно')
+        parser.add_argument('--group', help='Только посты группы со слагом')
+        parser.add_argument(
+            '--after', type=int,
+            help='Продолжить после этого id, последнего в прошлой выгрузке'
+        )
+        parser.add_argument(
+            '--output', help='Файл выгрузки, по умолчанию stdout'
+        )
+
+    def handle(self, *args, **options):
+        form = ExportForm({
+            name: options[name]
+            for name in ('format', 'since', 'until', 'group', 'after')
+            if options[name] is not None
+        })
+        if not form.is_valid():
+            raise CommandError(form.error_text())
+        lines = export.lines(
+            options['dataset'], options['format'], **form.filters()
+        )
+        if options['output'] is None:
+            self.stdout.writelines(lines)
+            return
+        with open(options['output'], 'w', encoding='utf-8',
+                  newline='') as file_:
+            file_.writelines(lines)
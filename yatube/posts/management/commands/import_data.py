@@ -0,0 +1,54 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import feeds, importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает группы, посты, комментарии и подписки из файлов NDJSON '
+        'или CSV в формате export_data'
+    )
+
+    # Порядок загрузки: записи ссылаются на загруженные раньше
+    DATASETS = ('groups', 'posts', 'comments', 'follows')
+
+    def add_arguments(self, parser):
+        for name in self.DATASETS:
+            parser.add_argument(f'--{name}', help='Файл с записями')
+        parser.add_argument(
+            '--format', choices=importer.FORMATS,
+            help='Формат файлов, по умолчанию по расширению'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Сколько записей вставлять в одной транзакции'
+        )
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help='Создавать пользователей с неизвестными username'
+        )
+
+    def handle(self, *args, **options):
+        files = [
+            (name, options[name]) for name in self.DATASETS if options[name]
+        ]
+        if not files:
+            raise CommandError('Укажите хотя бы один файл')
+        loader = importer.Importer(
+            options['batch_size'], options['create_users'], self.stdout
+        )
+        loader.pause_search()
+        try:
+            for name, path in files:
+                getattr(loader, name)(importer.read(path, options['format']))
+        except (OSError, importer.ImportFailed) as error:
+            raise CommandError(error)
+        finally:
+            loader.finish()
+        if feeds.is_materialized():
+            call_command('rebuild_follow_feeds', stdout=self.stdout)
+        for name, count in loader.imported.items():
+            skipped = loader.skipped.get(name, 0)
+            self.stdout.write(f'{name}: {count}, пропущено {skipped}')
+        self.stdout.write(self.style.SUCCESS('Данные загружены'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики постов, комментариев, подписок и картинок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько записей пересчитывать за один запрос'
+        )
+
+    def handle(self, *args, batch_size, **options):
+        counters.recount_posts(batch_size)
+        counters.recount_groups(batch_size)
+        counters.recount_authors(batch_size)
+        counters.recount_images(batch_size)
+        self.stdout.write(self.style.SUCCESS('Счетчики пересчитаны'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Ставит в очередь миниатюры и копии картинок, которых еще нет'
+
+    def handle(self, *args, **options):
+        count = thumbnails.schedule_missing()
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок в очереди: {count}'
+        ))
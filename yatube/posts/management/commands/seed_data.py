@@ -0,0 +1,51 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import counters, feeds
+from posts.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу пользователями, группами, постами, комментариями, '
+        'подписками и картинками для нагрузочных тестов'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in (
+            ('users', 1000), ('groups', 50), ('posts', 10000),
+            ('comments', 20000), ('follows', 10000), ('images', 100),
+        ):
+            parser.add_argument(
+                f'--{name}', type=int, default=default,
+                help=f'Сколько создать (по умолчанию {default})'
+            )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Начальное значение генератора случайных чисел'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько записей вставлять за один запрос'
+        )
+
+    def handle(self, *args, **options):
+        if not options['users'] and options['posts']:
+            raise CommandError('Для постов нужен хотя бы один пользователь')
+        seeder = Seeder(options['seed'], options['batch_size'], self.stdout)
+        with transaction.atomic():
+            seeder.users(options['users'])
+            seeder.groups(options['groups'])
+            seeder.posts(options['posts'])
+            if seeder.post_ids:
+                seeder.comments(options['comments'])
+            seeder.follows(options['follows'])
+        seeder.images(options['images'])
+        counters.recount_posts(options['batch_size'])
+        counters.recount_groups(options['batch_size'])
+        counters.recount_authors(options['batch_size'])
+        counters.recount_images(options['batch_size'])
+        if feeds.is_materialized():
+            call_command('rebuild_follow_feeds', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS('База наполнена'))
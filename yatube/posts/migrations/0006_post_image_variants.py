@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+def install_search(apps, schema_editor):
+    from posts import search
+
+    if search.is_available(schema_editor.connection):
+        search.install(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_search'),
+    ]
+
+    # SQLite пересоздает posts_post при изменении полей, а триггеры
+    # поискового индекса удаляются вместе с таблицей
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, install_search),
+        migrations.AddField(
+            model_name='post',
+            name='image_variants',
+            field=models.TextField(blank=True, default='', editable=False, help_text='Описание копий картинки разной ширины в JSON', verbose_name='Копии картинки'),
+        ),
+        migrations.RunPython(install_search, migrations.RunPython.noop),
+    ]
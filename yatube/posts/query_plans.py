@@ -0,0 +1,87 @@
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import resolve
+
+from .benchmark import scenarios
+
+# Строки плана SQLite, в которых таблица читается целиком: «SCAN t»
+# без «USING INDEX»; виртуальные таблицы FTS5 читаются своим индексом
+SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(?P<table>\w+)(?P<rest>.*)$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+def is_available(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def full_scan(detail):
+    """Таблица, которую строка плана читает целиком, или None."""
+    match = SCAN_RE.match(detail)
+    if match is None:
+        return None
+    rest = match.group('rest')
+    if 'USING' in rest or 'VIRTUAL TABLE' in rest:
+        return None
+    return match.group('table')
+
+
+def capture(client, url, params):
+    """SELECT-запросы страницы вместе с параметрами."""
+    queries = []
+
+    def wrapper(execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith('SELECT'):
+            queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        response = client.get(url, params)
+    return response.status_code, queries
+
+
+def explain(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def check(only=None):
+    """Планы запросов страниц из сценариев ``benchmark``.
+
+    Кэш очищается перед каждой страницей, чтобы выполнились все ее
+    запросы. Для каждого запроса возвращаются план, таблицы, которые он
+    читает целиком, и признак сортировки во временном B-дереве.
+    """
+    results = {}
+    hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+    with override_settings(ALLOWED_HOSTS=hosts):
+        for name, url, params, user in scenarios():
+            if only and name not in only:
+                continue
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            cache.clear()
+            status, queries = capture(client, url, params)
+            plans = []
+            for sql, query_params in queries:
+                plan = explain(sql, query_params)
+                plans.append({
+                    'sql': sql,
+                    'plan': plan,
+                    'full_scans': sorted(
+                        {table for table in map(full_scan, plan) if table}
+                    ),
+                    'temp_sort': any(TEMP_SORT in line for line in plan),
+                })
+            results[name] = {
+                'url': url,
+                'view': resolve(url).view_name,
+                'status': status,
+                'queries': plans,
+            }
+    return results
@@ -0,0 +1,209 @@
+import re
+
+from django.db import connection, connections, router
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .utils import NEXT, CursorPaginator
+
+# Служебные символы, которыми FTS5 отмечает совпадения в отрывке;
+# заменяются на <mark> после экранирования текста
+MARK_START = '\x02'
+MARK_END = '\x03'
+SNIPPET_TOKENS = 16
+
+TOKEN_RE = re.compile(r'\w+')
+
+SCHEMA = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts USING fts5(
+        text, content='posts_post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS posts_comment_fts USING fts5(
+        text, content='posts_comment', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+)
+
+TRIGGERS = {
+    'posts_post_fts': 'posts_post',
+    'posts_comment_fts': 'posts_comment',
+}
+
+TRIGGER_SQL = (
+    """
+    CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {table} BEGIN
+        INSERT INTO {index}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {table} BEGIN
+        INSERT INTO {index}({index}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS {index}_au AFTER UPDATE OF text ON {table}
+    BEGIN
+        INSERT INTO {index}({index}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {index}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+)
+
+
+def is_available(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def install(using=connection):
+    """Создает таблицы FTS5 и триггеры, заполняет индекс заново.
+
+    Триггеры удаляются вместе с таблицей, поэтому после миграций, которые
+    пересоздают ``posts_post`` или ``posts_comment``, команду
+    ``rebuild_search_index`` нужно запустить снова.
+    """
+    with using.cursor() as cursor:
+        for sql in SCHEMA:
+            cursor.execute(sql)
+        for index, table in TRIGGERS.items():
+            for sql in TRIGGER_SQL:
+                cursor.execute(sql.format(index=index, table=table))
+            cursor.execute(
+                f"INSERT INTO {index}({index}) VALUES ('rebuild')"
+            )
+
+
+def drop_triggers(using=connection):
+    """Отключает обновление индекса; ``install`` вернет его и заполнит."""
+    with using.cursor() as cursor:
+        for index in TRIGGERS:
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {index}_{suffix}')
+
+
+def uninstall(using=connection):
+    drop_triggers(using)
+    with using.cursor() as cursor:
+        for index in TRIGGERS:
+            cursor.execute(f'DROP TABLE IF EXISTS {index}')
+
+
+def match_expression(query):
+    """Запрос пользователя в синтаксисе FTS5: все слова по префиксу."""
+    return ' '.join(f'"{token}"*' for token in TOKEN_RE.findall(query))
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+def admin_filter(queryset, query):
+    """Посты, в тексте которых есть все слова запроса."""
+    expression = match_expression(query)
+    if not expression:
+        return queryset
+    return queryset.filter(pk__in=RawSQL(
+        'SELECT rowid FROM posts_post_fts WHERE posts_post_fts MATCH %s',
+        [expression],
+    ))
+
+
+class SearchPaginator(CursorPaginator):
+    """Результаты поиска по постам и комментариям, лучшие первыми.
+
+    Пост находится по своему тексту или по тексту комментариев к нему,
+    его вес - лучший из весов bm25 найденных текстов. Страницы выбираются
+    по ключу (вес, id), как в ``CursorPaginator``.
+    """
+
+    def __init__(self, query, per_page, group=None, author=None):
+        super().__init__([], per_page, keys=('rank', 'id'))
+        self.expression = match_expression(query)
+        self.group = group
+        self.author = author
+
+    def parse(self, values):
+        try:
+            return [float(values[0]), int(values[1])]
+        except (ValueError, TypeError):
+            return None
+
+    def fetch(self, direction, values, limit):
+        if not self.expression:
+            return []
+        params = [
+            MARK_START, MARK_END, SNIPPET_TOKENS, self.expression,
+            MARK_START, MARK_END, SNIPPET_TOKENS, self.expression,
+        ]
+        conditions = []
+        if self.group is not None:
+            conditions.append('p.group_id = %s')
+            params.append(self.group.pk)
+        if self.author is not None:
+            conditions.append('p.author_id = %s')
+            params.append(self.author.pk)
+        order = 'ASC' if direction == NEXT else 'DESC'
+        if values is not None:
+            sign = '>' if direction == NEXT else '<'
+            conditions.append(
+                f'(hits.rank {sign} %s '
+                f'OR (hits.rank = %s AND hits.post_id {sign} %s))'
+            )
+            params.extend([values[0], values[0], values[1]])
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+        sql = f"""
+            WITH matches AS (
+                SELECT rowid AS post_id,
+                       bm25(posts_post_fts) AS rank,
+                       snippet(posts_post_fts, 0, %s, %s, '…', %s) AS snippet
+                FROM posts_post_fts
+                WHERE posts_post_fts MATCH %s
+                UNION ALL
+                SELECT c.post_id,
+                       bm25(posts_comment_fts),
+                       snippet(posts_comment_fts, 0, %s, %s, '…', %s)
+                FROM posts_comment_fts
+                JOIN posts_comment c ON c.id = posts_comment_fts.rowid
+                WHERE posts_comment_fts MATCH %s
+            ), hits AS (
+                SELECT post_id, MIN(rank) AS rank, snippet
+                FROM matches GROUP BY post_id
+            )
+            SELECT hits.post_id, hits.rank, hits.snippet
+            FROM hits JOIN posts_post p ON p.id = hits.post_id
+            {where}
+            ORDER BY hits.rank {order}, hits.post_id {order}
+            LIMIT %s
+        """
+        params.append(limit)
+        # Индекс читается из той же базы, что и посты: реплика может еще
+        # не получить пост, найденный в основной
+        using = router.db_for_read(Post)
+        with connections[using].cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        posts = Post.objects.feed().using(using).in_bulk(
+            [row[0] for row in rows]
+        )
+        results = []
+        for post_id, rank, snippet in rows:
+            # Пост могли удалить между двумя запросами
+            post = posts.get(post_id)
+            if post is None:
+                continue
+            post.rank = rank
+            post.snippet = highlight(snippet)
+            results.append(post)
+        return results
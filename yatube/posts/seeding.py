@@ -0,0 +1,167 @@
+import random
+from datetime import timedelta
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+SEED_PASSWORD = 'seed-password'
+# Насколько сильно авторы отличаются по популярности: чем больше степень,
+# тем больше постов и подписчиков у первых авторов
+POPULARITY_SKEW = 3
+
+
+class Seeder:
+    """Наполняет базу большим объемом правдоподобных данных.
+
+    Записи создаются через ``bulk_create`` пачками по ``batch_size``,
+    поэтому сигналы не срабатывают; счетчики и ленты нужно пересчитать
+    после наполнения. При одинаковом ``seed`` данные совпадают.
+    """
+
+    def __init__(self, seed=0, batch_size=1000, stdout=None):
+        self.random = random.Random(seed)
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(seed)
+        self.batch_size = batch_size
+        self.stdout = stdout
+        self.user_ids = []
+        self.group_ids = []
+        self.post_ids = []
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def pick(self, ids):
+        """Случайный id, первые в списке выпадают чаще."""
+        return ids[int(len(ids) * self.random.random() ** POPULARITY_SKEW)]
+
+    def _create(self, model, objects, total):
+        created = 0
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) == self.batch_size:
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+                created += len(batch)
+                batch = []
+                self.log(f'{model.__name__}: {created} из {total}')
+        if batch:
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def _new_ids(self, model, last_id):
+        return list(
+            model.objects.filter(pk__gt=last_id)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+
+    def _last_id(self, model):
+        last = model.objects.order_by('-pk').values_list('pk', flat=True)
+        return last.first() or 0
+
+    def users(self, count):
+        last_id = self._last_id(User)
+        password = make_password(SEED_PASSWORD)
+        self._create(User, (
+            User(
+                username=f'seed{last_id + number}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password,
+            )
+            for number in range(1, count + 1)
+        ), count)
+        self.user_ids = self._new_ids(User, last_id)
+
+    def groups(self, count):
+        last_id = self._last_id(Group)
+        self._create(Group, (
+            Group(
+                title=self.fake.sentence(nb_words=3)[:200],
+                slug=f'seed-{last_id + number}',
+                description=self.fake.paragraph(),
+            )
+            for number in range(1, count + 1)
+        ), count)
+        self.group_ids = self._new_ids(Group, last_id)
+
+    def posts(self, count, days=365):
+        """Посты со случайным автором и группой.
+
+        ``pub_date`` заполняется автоматически, поэтому после вставки даты
+        пачек растягиваются на ``days`` дней назад, по одной дате на пачку.
+        """
+        last_id = self._last_id(Post)
+        self._create(Post, (
+            Post(
+                text=self.fake.text(max_nb_chars=400),
+                author_id=self.pick(self.user_ids),
+                group_id=(
+                    self.random.choice(self.group_ids)
+                    if self.group_ids and self.random.random() < 0.7
+                    else None
+                ),
+            )
+            for _ in range(count)
+        ), count)
+        self.post_ids = self._new_ids(Post, last_id)
+        batches = range(0, len(self.post_ids), self.batch_size)
+        step = timedelta(days=days) / max(len(batches), 1)
+        now = timezone.now()
+        for number, start in enumerate(batches):
+            Post.objects.filter(
+                pk__in=self.post_ids[start:start + self.batch_size]
+            ).update(pub_date=now - step * (len(batches) - number))
+
+    def comments(self, count):
+        """Комментарии; к свежим постам пишут чаще."""
+        recent_first = self.post_ids[::-1]
+        self._create(Comment, (
+            Comment(
+                post_id=self.pick(recent_first),
+                author_id=self.random.choice(self.user_ids),
+                text=self.fake.sentence(nb_words=12),
+            )
+            for _ in range(count)
+        ), count)
+
+    def follows(self, count):
+        """Подписки без повторов; на популярных авторов подписаны чаще."""
+        limit = len(self.user_ids) * (len(self.user_ids) - 1)
+        count = min(count, limit)
+        pairs = set()
+        while len(pairs) < count:
+            user_id = self.random.choice(self.user_ids)
+            author_id = self.pick(self.user_ids)
+            if user_id != author_id:
+                pairs.add((user_id, author_id))
+        self._create(Follow, (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in sorted(pairs)
+        ), count)
+
+    def images(self, count, size=(960, 540)):
+        """Разные картинки для ``count`` случайных постов."""
+        post_ids = self.random.sample(
+            self.post_ids, min(count, len(self.post_ids))
+        )
+        storage = Post._meta.get_field('image').storage
+        for number, post_id in enumerate(post_ids, start=1):
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            buffer = BytesIO()
+            Image.new('RGB', size, color).save(buffer, 'JPEG')
+            name = storage.save(
+                f'posts/seed_{post_id}.jpg', ContentFile(buffer.getvalue())
+            )
+            Post.objects.filter(pk=post_id).update(image=name)
+            if number % self.batch_size == 0:
+                self.log(f'Картинки: {number} из {len(post_ids)}')
@@ -0,0 +1,165 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+
+from . import counters, feeds
+from .caching import bump_version
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Поля пользователя, которые выводятся в карточках постов
+AUTHOR_DISPLAY_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+def invalidate_post_feeds(post, group_ids=()):
+    bump_version('post', post.pk)
+    # Карточка поста не выводит комментарии, ее версия меняется только
+    # вместе с самим постом
+    bump_version('post_card', post.pk)
+    bump_version('index')
+    feeds.invalidate_author(post.author_id)
+    for group_id in {post.group_id, *group_ids}:
+        if group_id is not None:
+            bump_version('group', group_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_values(sender, instance, **kwargs):
+    instance._previous_group_id = None
+    instance._previous_image = None
+    if instance.pk is not None:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'image')
+            .first()
+        ) or (None, None)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    previous_image = getattr(instance, '_previous_image', None)
+    invalidate_post_feeds(instance, [previous_group_id])
+    if created:
+        counters.change_author(instance.author_id, posts_count=1)
+        counters.change_group(instance.group_id, 1)
+        counters.change_image(instance.image.name, 1)
+        schedule_images(instance)
+        if feeds.is_materialized():
+            feeds.post_published.delay(instance.pk)
+        return
+    if previous_group_id != instance.group_id:
+        counters.change_group(previous_group_id, -1)
+        counters.change_group(instance.group_id, 1)
+    if previous_image != instance.image.name:
+        counters.change_image(previous_image, -1)
+        counters.change_image(instance.image.name, 1)
+        # Копии старой картинки не подходят, новые создаст фоновая задача
+        instance.image_variants = ''
+        Post.objects.filter(pk=instance.pk).update(image_variants='')
+        schedule_images(instance)
+
+
+def schedule_images(post):
+    # thumbnails импортирует этот модуль, поэтому импорт здесь
+    from . import thumbnails
+
+    if post.image:
+        thumbnails.schedule(post.image.name)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    invalidate_post_feeds(instance)
+    counters.change_author(instance.author_id, posts_count=-1)
+    counters.change_group(instance.group_id, -1)
+    counters.change_image(instance.image.name, -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    bump_version('post', instance.post_id)
+    if created:
+        counters.change_post(instance.post_id, 1)
+        counters.change_author(instance.author_id, comments_count=1)
+        bump_version('stats', instance.author_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    bump_version('post', instance.post_id)
+    bump_version('stats', instance.author_id)
+    counters.change_post(instance.post_id, -1)
+    counters.change_author(instance.author_id, comments_count=-1)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    bump_version('index')
+    bump_version('group', instance.pk)
+    bump_version('group_info', instance.pk)
+    author_ids = (
+        Post.objects.filter(group=instance)
+        .values_list('author_id', flat=True)
+        .distinct()
+    )
+    for author_id in author_ids:
+        feeds.invalidate_author(author_id)
+
+
+@receiver(post_save, sender=User)
+def author_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is not None and not (
+        AUTHOR_DISPLAY_FIELDS & set(update_fields)
+    ):
+        return
+    bump_version('index')
+    feeds.invalidate_author(instance.pk)
+    bump_version('author', instance.pk)
+    group_ids = (
+        Post.objects.filter(author=instance, group__isnull=False)
+        .values_list('group_id', flat=True)
+        .distinct()
+    )
+    for group_id in group_ids:
+        bump_version('group', group_id)
+
+
+@receiver(pre_delete, sender=User)
+def author_deleting(sender, instance, **kwargs):
+    counters.user_deleting(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def author_deleted(sender, instance, **kwargs):
+    counters.user_deleted(instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if not created:
+        return
+    counters.change_author(instance.author_id, followers_count=1)
+    counters.change_author(instance.user_id, following_count=1)
+    bump_version('stats', instance.author_id)
+    bump_version('stats', instance.user_id)
+    bump_version('follow_feed', instance.user_id)
+    if feeds.is_materialized():
+        feeds.follow_added.delay(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_author(instance.author_id, followers_count=-1)
+    counters.change_author(instance.user_id, following_count=-1)
+    bump_version('stats', instance.author_id)
+    bump_version('stats', instance.user_id)
+    bump_version('follow_feed', instance.user_id)
+    if feeds.is_materialized():
+        feeds.follow_removed.delay(instance.user_id, instance.author_id)
@@ -0,0 +1,77 @@
+import hashlib
+import os
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+BLOB_RE = re.compile(r'^[0-9a-f]{64}(\.\w+)?$')
+SHARD_RE = re.compile(r'^[0-9a-f]{2}$')
+
+
+def blob_name(directory, digest, extension=''):
+    """Имя файла по хэшу содержимого в двухуровневом дереве каталогов."""
+    return f'{directory}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+def blob_names(storage, directory):
+    """Все файлы дерева ``blob_name`` в каталоге хранилища."""
+    if not storage.exists(directory):
+        return
+    for first in storage.listdir(directory)[0]:
+        if not SHARD_RE.match(first):
+            continue
+        for second in storage.listdir(f'{directory}/{first}')[0]:
+            if not SHARD_RE.match(second):
+                continue
+            shard = f'{directory}/{first}/{second}'
+            for filename in storage.listdir(shard)[1]:
+                if BLOB_RE.match(filename):
+                    yield f'{shard}/{filename}'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, в котором одинаковые файлы хранятся один раз.
+
+    Загрузка пишется во временный файл и одновременно хэшируется, затем
+    файл получает имя ``blob_name`` по хэшу в каталоге из ``upload_to``.
+    Если такой файл уже есть, новый не сохраняется, а у старого
+    обновляется время изменения, чтобы его не удалил сборщик мусора.
+    Файлы не удаляются вместе с постами: ссылки на них считает
+    ``ImageBlob``, а удаляет команда ``collect_image_garbage``.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Имя все равно заменяется хэшем содержимого
+        return name
+
+    def _save(self, name, content):
+        directory, filename = os.path.split(name)
+        incoming = self.path(directory)
+        os.makedirs(incoming, exist_ok=True)
+        digest = hashlib.sha256()
+        descriptor, temporary = tempfile.mkstemp(
+            dir=incoming, prefix='.upload-'
+        )
+        try:
+            with os.fdopen(descriptor, 'wb') as file_:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file_.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temporary, self.file_permissions_mode)
+            name = blob_name(
+                directory, digest.hexdigest(),
+                os.path.splitext(filename)[1].lower(),
+            )
+            path = self.path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                os.link(temporary, path)
+            except FileExistsError:
+                os.utime(path)
+        finally:
+            os.unlink(temporary)
+        return name
@@ -0,0 +1,11 @@
+from django import template
+
+from posts import caching
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Готовые карточки постов, см. ``posts.caching.post_cards``."""
+    return caching.post_cards(posts)
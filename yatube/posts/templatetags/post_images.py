@@ -0,0 +1,28 @@
+from django import template
+
+from posts import images, thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_thumbnail(file_, geometry_string, **options):
+    """Миниатюра, если она уже создана, иначе None.
+
+    Страница не ждет обработки картинки и ничего не пишет в базу: задачу
+    ставит сохранение поста, а пока миниатюры нет, шаблон выводит
+    заглушку.
+    """
+    if not file_:
+        return None
+    return thumbnails.find_thumbnail(file_, geometry_string, **options)
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def picture(variants, original=None):
+    """Тег ``<picture>`` с копиями картинки поста для ``srcset``.
+
+    Если копий нет (картинка больше POST_IMAGE_MAX_PIXELS), выводится
+    ``original``.
+    """
+    return {'picture': images.picture(variants), 'original': original}
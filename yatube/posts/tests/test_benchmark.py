@@ -0,0 +1,71 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..models import AuthorStats, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'seed_data', users=20, groups=3, posts=60, comments=40,
+            follows=30, images=2, batch_size=25, stdout=StringIO(),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_seed_data(self):
+        """Наполнение создает записи и пересчитывает счетчики."""
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertEqual(Follow.objects.count(), 30)
+        self.assertEqual(Post.objects.exclude(image='').count(), 2)
+        stats = AuthorStats.objects.values_list('posts_count', flat=True)
+        self.assertEqual(sum(stats), 60)
+        dates = Post.objects.values_list('pub_date', flat=True)
+        self.assertGreater(max(dates) - min(dates), timedelta(days=30))
+
+    def test_benchmark_saves_json(self):
+        """Замеры сохраняются в JSON и сравниваются с прошлым прогоном."""
+        output = os.path.join(TEMP_MEDIA_ROOT, 'result.json')
+        call_command(
+            'benchmark', requests=3, warmup=1, cold=True, output=output,
+            stdout=StringIO(),
+        )
+        with open(output) as file:
+            data = json.load(file)
+        self.assertEqual(data['dataset']['posts'], 60)
+        for name in ('index', 'profile', 'post_detail', 'follow_index'):
+            with self.subTest(scenario=name):
+                result = data['scenarios'][name]
+                self.assertEqual(result['statuses'], {'200': 3})
+                self.assertIsInstance(result['over_budget'], list)
+                self.assertGreater(result['queries_mean'], 0)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        stdout = StringIO()
+        call_command(
+            'benchmark', requests=1, warmup=0, scenarios=['index'],
+            output=os.path.join(TEMP_MEDIA_ROOT, 'next.json'),
+            compare=output, stdout=stdout,
+        )
+        self.assertIn('index: p95_ms', stdout.getvalue())
@@ -0,0 +1,119 @@
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+
+from core.budgets import BudgetExceeded
+
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.seed(posts=10)
+
+    @classmethod
+    def seed(cls, posts):
+        call_command(
+            'seed_data', users=10, groups=2, posts=posts, comments=posts,
+            follows=20, images=0, stdout=StringIO(),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def requests(self):
+        """Запросы ко всем страницам: маршрут, метод, адрес, данные."""
+        post = Post.objects.order_by('-comments_count', 'pk').first()
+        other = User.objects.exclude(pk=post.author_id).first()
+        Follow.objects.filter(user=post.author, author=other).delete()
+        group = Group.objects.order_by('-posts_count', 'pk').first()
+        self.client.force_login(post.author)
+        return [
+            ('posts:index', 'get', reverse('posts:index'), {'page': 2}),
+            ('posts:group_list', 'get',
+             reverse('posts:group_list', args=[group.slug]), {'page': 2}),
+            ('posts:profile', 'get',
+             reverse('posts:profile', args=[post.author.username]), {}),
+            ('posts:post_detail', 'get',
+             reverse('posts:post_detail', args=[post.pk]), {}),
+            ('posts:post_comments', 'get',
+             reverse('posts:post_comments', args=[post.pk]), {}),
+            ('posts:follow_index', 'get', reverse('posts:follow_index'), {}),
+            ('posts:search', 'get', reverse('posts:search'),
+             {'q': post.text.split()[0]}),
+            ('posts:post_create', 'get', reverse('posts:post_create'), {}),
+            ('posts:post_edit', 'get',
+             reverse('posts:post_edit', args=[post.pk]), {}),
+            ('posts:add_comment', 'post',
+             reverse('posts:add_comment', args=[post.pk]),
+             {'text': 'Комментарий'}),
+            ('posts:profile_follow', 'get',
+             reverse('posts:profile_follow', args=[other.username]), {}),
+            ('posts:profile_unfollow', 'get',
+             reverse('posts:profile_unfollow', args=[other.username]), {}),
+            ('about:author', 'get', reverse('about:author'), {}),
+            ('about:tech', 'get', reverse('about:tech'), {}),
+        ]
+
+    def count_queries(self):
+        counts = {}
+        for name, method, url, data in self.requests():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(self.client, method)(url, data)
+            self.assertLess(response.status_code, 400, name)
+            counts[name] = len(queries)
+        return counts
+
+    def test_budgets_cover_all_pages(self):
+        """У каждой страницы постов и about есть бюджет."""
+        resolver = get_resolver()
+        for namespace in ('posts', 'about'):
+            names = resolver.namespace_dict[namespace][1].reverse_dict
+            for name in names:
+                if isinstance(name, str):
+                    with self.subTest(name=name):
+                        self.assertIn(
+                            f'{namespace}:{name}', settings.QUERY_BUDGETS
+                        )
+
+    def test_pages_stay_within_budget_as_data_grows(self):
+        """Число запросов не выходит за бюджет и не растет с данными."""
+        before = self.count_queries()
+        self.seed(posts=120)
+        after = self.count_queries()
+        for name, queries in after.items():
+            with self.subTest(name=name):
+                self.assertLessEqual(
+                    queries, settings.QUERY_BUDGETS[name]['queries']
+                )
+                self.assertEqual(queries, before[name])
+
+    @override_settings(
+        DEBUG=True, QUERY_BUDGET_MODE='raise',
+        QUERY_BUDGETS={'posts:index': {'queries': 0, 'ms': 1000}},
+    )
+    def test_middleware_fails_requests_over_budget(self):
+        with self.assertLogs('django.request', 'ERROR'):
+            with self.assertRaises(BudgetExceeded):
+                Client().get(reverse('posts:index'))
+
+    @override_settings(
+        DEBUG=True, QUERY_BUDGET_MODE='log',
+        QUERY_BUDGETS={'posts:index': {'queries': 0, 'ms': 1000}},
+    )
+    def test_middleware_logs_requests_over_budget(self):
+        with self.assertLogs('yatube.performance', 'WARNING') as logs:
+            Client().get(reverse('posts:index'))
+        self.assertIn('posts:index', logs.output[0])
@@ -1,9 +1,12 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.test import TestCase
+from django.template.loader import render_to_string
+from django.test import Client, TestCase
 from django.urls import reverse
 
-from ..models import Post
+from ..models import Comment, Follow, Group, Post
 
 
 User = get_user_model()
@@ -17,16 +20,225 @@ class CacheTests(TestCase):
 
         cls.no_user_name = 'noUserName'
         cls.user = User.objects.create_user(username=cls.no_user_name)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='cache-slug',
+            description='Тестовое описание',
+        )
         cls.post = Post.objects.create(
             author=cls.user,
             text='Тестовый пост',
+            group=cls.group,
         )
 
+    def setUp(self):
+        cache.clear()
+
     def test_cache_index_page(self):
         content = self.client.get(reverse('posts:index')).content
-        self.post.delete()
+        # update() не отправляет сигналы, поэтому кэш не сбрасывается
+        Post.objects.filter(pk=self.post.pk).update(text='Новый текст')
         content_cache = self.client.get(reverse('posts:index')).content
         self.assertEqual(content, content_cache, 'Не работает cache страницы')
         cache.clear()
         content_cache_clear = self.client.get(reverse('posts:index')).content
         self.assertNotEqual(content, content_cache_clear)
+
+    def test_cache_is_invalidated_on_post_changes(self):
+        """Изменение и удаление поста сбрасывают кэш лент."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.client.get(url)
+                post = Post.objects.create(
+                    author=self.user, text='Свежий пост', group=self.group
+                )
+                self.assertContains(self.client.get(url), 'Свежий пост')
+                post.text = 'Исправленный пост'
+                post.save()
+                self.assertContains(self.client.get(url), 'Исправленный пост')
+                post.delete()
+                self.assertNotContains(
+                    self.client.get(url), 'Исправленный пост'
+                )
+
+    def test_cache_is_invalidated_on_group_and_author_changes(self):
+        """Изменение группы и автора сбрасывает кэш главной страницы."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'new-cache-slug'
+        group.save()
+        self.assertContains(self.client.get(url), 'new-cache-slug')
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Антон'
+        user.save()
+        self.assertContains(self.client.get(url), 'Антон')
+
+    def test_cache_depends_on_page(self):
+        """Каждая страница ленты кэшируется отдельно."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {num}') for num in range(12)
+        )
+        cache.clear()
+        first_page = self.client.get(reverse('posts:index')).content
+        second_page = self.client.get(
+            reverse('posts:index'), {'page': 2}
+        ).content
+        self.assertNotEqual(first_page, second_page)
+
+    def test_cached_page_skips_feed_query(self):
+        """Страница ленты из кэша не обращается к базе."""
+        client = Client()
+        client.force_login(self.user)
+        url = reverse('posts:index')
+        first = client.get(url)
+        # Остается запрос пользователя, сессия берется из кэша
+        with self.assertNumQueries(1):
+            second = client.get(url)
+        self.assertEqual(
+            list(first.context['page_obj']), list(second.context['page_obj'])
+        )
+        self.assertEqual(
+            second.context['page_obj'].paginator.next_cursor,
+            first.context['page_obj'].paginator.next_cursor,
+        )
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='page-cache')
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост', group=cls.group
+        )
+        cls.urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_list', args=[cls.group.slug]),
+            'profile': reverse('posts:profile', args=[cls.author.username]),
+            'detail': reverse('posts:post_detail', args=[cls.post.pk]),
+        }
+
+    def setUp(self):
+        cache.clear()
+        for url in self.urls.values():
+            self.client.get(url)
+
+    def assertCached(self, *names):
+        for name in names:
+            with self.subTest(page=name):
+                with self.assertNumQueries(0):
+                    response = self.client.get(self.urls[name])
+                self.assertIsNone(response.context)
+
+    def assertRendered(self, *names):
+        for name in names:
+            with self.subTest(page=name):
+                response = self.client.get(self.urls[name])
+                self.assertIsNotNone(response.context)
+
+    def test_anonymous_pages_are_cached(self):
+        self.assertCached('index', 'group', 'profile', 'detail')
+
+    def test_authorized_pages_are_not_cached(self):
+        client = Client()
+        client.force_login(self.reader)
+        client.get(self.urls['index'])
+        self.assertIsNotNone(client.get(self.urls['index']).context)
+
+    def test_comment_purges_only_post_page(self):
+        """Комментарий сбрасывает страницу поста, но не ленты."""
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        self.assertContains(self.client.get(self.urls['detail']),
+                            'Комментарий')
+        self.assertCached('index', 'group')
+
+    def test_follow_purges_only_profile(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertRendered('profile')
+        self.assertCached('index', 'group', 'detail')
+
+    def test_post_changes_purge_its_pages(self):
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        for name in self.urls:
+            with self.subTest(page=name):
+                self.assertContains(
+                    self.client.get(self.urls[name]), 'Новый текст'
+                )
+
+    def test_group_change_purges_its_pages(self):
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Другая группа'
+        group.save()
+        self.assertRendered('index', 'group', 'profile', 'detail')
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='cards')
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост', group=cls.group
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def visit_feeds(self):
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:follow_index'),
+        ]
+        with mock.patch(
+            'posts.caching.render_to_string', wraps=render_to_string
+        ) as render:
+            for url in urls:
+                self.reader_client.get(url)
+        return render.call_count
+
+    def test_card_is_rendered_once_for_all_feeds(self):
+        """Карточка поста рендерится один раз для всех лент."""
+        self.assertEqual(self.visit_feeds(), 1)
+        self.assertEqual(self.visit_feeds(), 0)
+
+    def test_card_is_rendered_again_after_author_change(self):
+        self.visit_feeds()
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Антон'
+        author.save()
+        self.assertEqual(self.visit_feeds(), 1)
+        self.assertContains(self.reader_client.get('/'), 'Антон')
+
+    def test_comment_keeps_card(self):
+        """Комментарий не заставляет рендерить карточку заново."""
+        self.visit_feeds()
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        self.assertEqual(self.visit_feeds(), 0)
+
+    def test_card_is_rendered_again_after_post_change(self):
+        self.visit_feeds()
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(self.visit_feeds(), 1)
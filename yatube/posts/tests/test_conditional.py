@@ -0,0 +1,113 @@
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='conditional')
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост', group=cls.group
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def revalidate(self, client, url):
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_pages_are_not_modified(self):
+        """Повторный запрос с тем же ETag получает 304 без запросов постов."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                # Первый ответ может выдать CSRF-cookie, она входит в ETag
+                self.reader_client.get(url)
+                etag = self.reader_client.get(url)['ETag']
+                # Остается только запрос пользователя
+                with self.assertNumQueries(1):
+                    response = self.reader_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+                self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+                self.assertEqual(response['ETag'], etag)
+
+    def test_changes_produce_full_response(self):
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        etag = self.reader_client.get(url)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Новый комментарий'
+        )
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Новый комментарий')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_follow_feed_changes_with_new_posts(self):
+        url = reverse('posts:follow_index')
+        etag = self.reader_client.get(url)['ETag']
+        Post.objects.create(author=self.author, text='Свежий пост')
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Свежий пост')
+
+    def test_etag_depends_on_user(self):
+        url = reverse('posts:profile', args=[self.author.username])
+        etag = self.reader_client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            self.revalidate(self.client, url).status_code,
+            HTTPStatus.NOT_MODIFIED,
+        )
+
+    def test_unchanged_versions_are_not_written_again(self):
+        """Повторный полный ответ не перезаписывает те же версии."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.reader_client.get(url)
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            self.reader_client.get(url)
+        written = [
+            call.args[0] for call in cache_set.call_args_list
+            if call.args[0].startswith('page_versions:')
+        ]
+        self.assertEqual(written, [])
+
+    def test_follow_feed_versions_do_not_grow_with_follows(self):
+        """Лента подписок зависит от своей версии, а не от всех авторов."""
+        for number in range(5):
+            author = User.objects.create_user(username=f'author{number}')
+            Follow.objects.create(user=self.reader, author=author)
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        versions = response.wsgi_request.page_cache_versions
+        self.assertFalse([key for key in versions if ':profile:' in key])
+        self.assertIn(f'feed_version:follow_feed:{self.reader.pk}', versions)
+
+    def test_follow_feed_changes_with_author_rename(self):
+        url = reverse('posts:follow_index')
+        etag = self.reader_client.get(url)['ETag']
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Антон'
+        author.save()
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Антон')
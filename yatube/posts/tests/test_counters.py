@@ -0,0 +1,136 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import AuthorStats, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.other_group = Group.objects.create(title='Другая', slug='other')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        """Счетчики меняются вместе с постами, комментариями и подписками."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        Comment.objects.create(post=post, author=self.reader, text='Ответ')
+        Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(self.stats(self.reader).comments_count, 1)
+        post.delete()
+        Follow.objects.all().delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).comments_count, 0)
+
+    def test_group_change_moves_post_count(self):
+        """Перенос поста в другую группу переносит счетчик."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        post.group = self.other_group
+        post.save()
+        self.assertEqual(
+            Group.objects.get(pk=self.group.pk).posts_count, 0
+        )
+        self.assertEqual(
+            Group.objects.get(pk=self.other_group.pk).posts_count, 1
+        )
+
+    def test_pages_show_counters_without_aggregates(self):
+        """Профиль и пост выводят счетчики без агрегирующих запросов."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        urls = [
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as context:
+                    response = self.reader_client.get(url)
+                self.assertEqual(response.context['posts_count'], 1)
+                for query in context.captured_queries:
+                    self.assertNotIn('COUNT(', query['sql'].upper())
+
+    def test_recount_command_repairs_drift(self):
+        """Команда recount_counters исправляет расхождения."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        Comment.objects.create(post=post, author=self.reader, text='Ответ')
+        Post.objects.update(comments_count=7)
+        Group.objects.update(posts_count=7)
+        AuthorStats.objects.all().delete()
+        call_command('recount_counters', batch_size=1, stdout=StringIO())
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 1)
+        self.assertEqual(Group.objects.get(pk=self.group.pk).posts_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.reader).comments_count, 1)
+
+    def test_delete_with_stale_counters(self):
+        """Удаление не падает, если счетчики отстали и равны нулю."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        Comment.objects.create(post=post, author=self.reader, text='Ответ')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.update(comments_count=0)
+        Group.objects.update(posts_count=0)
+        AuthorStats.objects.update(
+            posts_count=0, comments_count=0,
+            followers_count=0, following_count=0,
+        )
+        follow.delete()
+        post.delete()
+        self.assertEqual(Group.objects.get(pk=self.group.pk).posts_count, 0)
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+        self.assertEqual(self.stats(self.reader).comments_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_delete_user_with_posts_comments_and_follows(self):
+        """Удаление пользователя не возвращает его счетчики."""
+        user = User.objects.create_user(username='leaving')
+        own_post = Post.objects.create(
+            author=user, text='Пост', group=self.group
+        )
+        post = Post.objects.create(author=self.author, text='Чужой пост')
+        Comment.objects.create(post=post, author=user, text='Ответ')
+        Comment.objects.create(post=own_post, author=self.reader, text='Ой')
+        Follow.objects.create(user=user, author=self.author)
+        Follow.objects.create(user=self.reader, author=user)
+        user_id = user.pk
+        user.delete()
+        self.assertFalse(AuthorStats.objects.filter(user_id=user_id).exists())
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 0)
+        self.assertEqual(Group.objects.get(pk=self.group.pk).posts_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+        self.assertEqual(self.stats(self.reader).comments_count, 0)
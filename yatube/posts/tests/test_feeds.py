@@ -0,0 +1,109 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core import tasks
+from core.models import Task
+
+from ..models import FeedEntry, Follow, Post
+
+User = get_user_model()
+
+
+@override_settings(FOLLOW_FEED_MATERIALIZED=True)
+class MaterializedFollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Пост до подписки'
+        )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def feed(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_post_fans_out(self):
+        """Подписка заполняет ленту, новый пост раскладывается по лентам."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        tasks.run_pending()
+        self.assertEqual(self.feed(), [self.old_post])
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        tasks.run_pending()
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.reader, post=new_post).exists()
+        )
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    def test_unfollow_cleans_feed(self):
+        """Отписка удаляет посты автора из ленты."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        tasks.run_pending()
+        follow.delete()
+        tasks.run_pending()
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed(), [])
+
+    def test_unfollow_task_before_follow_task(self):
+        """Отписка, выполненная раньше подписки, не оставляет постов."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        follow.delete()
+        Task.objects.filter(name='posts.feeds.follow_added').update(
+            run_after=timezone.now() + timedelta(minutes=1)
+        )
+        tasks.run_pending()
+        self.assertTrue(
+            Task.objects.filter(name='posts.feeds.follow_added').exists()
+        )
+        Task.objects.update(run_after=timezone.now())
+        tasks.run_pending()
+        self.assertFalse(Task.objects.exists())
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed(), [])
+
+    @override_settings(FOLLOW_FEED_FANOUT_LIMIT=0)
+    def test_popular_author_is_read_on_request(self):
+        """Посты популярных авторов не раскладываются, но попадают в ленту."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        tasks.run_pending()
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    def test_feed_does_not_count_followers(self):
+        """Популярность авторов берется из счетчиков, без COUNT(*)."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        tasks.run_pending()
+        with CaptureQueriesContext(connection) as queries:
+            self.feed()
+            Post.objects.create(author=self.author, text='Новый пост')
+            tasks.run_pending()
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+
+    def test_feed_cursor_pages(self):
+        """Курсор материализованной ленты ведет на следующую страницу."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {num}') for num in range(10)
+        )
+        call_command('rebuild_follow_feeds', stdout=StringIO())
+        url = reverse('posts:follow_index')
+        first_page = self.reader_client.get(url).context['page_obj']
+        second_page = self.reader_client.get(
+            url, {'cursor': first_page.paginator.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(second_page), [self.old_post])
@@ -1,5 +1,6 @@
 import shutil
 import tempfile
+from hashlib import sha256
 from http import HTTPStatus
 
 from django.conf import settings
@@ -7,6 +8,7 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from posts.models import Post, Group, User, Comment
+from posts.storage import blob_name
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -17,7 +19,7 @@ class PostCreateFormTests(TestCase):
     def setUpClass(cls):
         super().setUpClass()
         cls.user = User.objects.create_user(username='anton')
-        small_gif = (
+        cls.small_gif = small_gif = (
             b'\x47\x49\x46\x38\x39\x61\x02\x00'
             b'\x01\x00\x80\x00\x00\x00\x00\x00'
             b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
@@ -57,7 +59,11 @@ class PostCreateFormTests(TestCase):
         form_data = {
             'text': 'Тестовый текст',
             'group': self.group.pk,
-            'image': self.uploaded,
+            'image': SimpleUploadedFile(
+                name='new_small.gif',
+                content=self.small_gif,
+                content_type='image/gif'
+            ),
         }
         response = self.authorized_client.post(
             reverse('posts:post_create'),
@@ -72,6 +78,11 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(form_data['text'], last_object.text)
         self.assertEqual(form_data['group'], last_object.group.pk)
         self.assertTrue(form_data['image'], last_object.image)
+        # Картинка хранится под хэшем содержимого
+        self.assertEqual(
+            last_object.image.name,
+            blob_name('posts', sha256(self.small_gif).hexdigest(), '.gif'),
+        )
 
     def test_edit_post(self):
         form_data = {
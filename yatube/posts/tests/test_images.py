@@ -0,0 +1,144 @@
+import json
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template.loader import render_to_string
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from .. import images
+from ..forms import PostForm
+from ..models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def jpeg(size=(1200, 800), orientation=None):
+    """JPEG с EXIF: камерой и, если задано, поворотом."""
+    exif = Image.Exif()
+    exif[0x0110] = 'Test Camera'
+    if orientation is not None:
+        exif[images.ORIENTATION] = orientation
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 50, 50)).save(
+        buffer, 'JPEG', exif=exif.tobytes()
+    )
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageVariantsTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def save(self, data, name='posts/photo.jpg'):
+        return default_storage.save(name, SimpleUploadedFile(name, data))
+
+    def test_variants_for_every_width_and_format(self):
+        """Копии всех ширин в WebP и JPEG, без EXIF и по хэшу содержимого."""
+        manifest = json.loads(images.build_variants(self.save(jpeg())))
+        self.assertEqual((manifest['width'], manifest['height']), (960, 339))
+        self.assertEqual(
+            [source['type'] for source in manifest['sources']],
+            ['image/webp', 'image/jpeg'],
+        )
+        for source in manifest['sources']:
+            self.assertEqual(
+                [width for width, _ in source['files']],
+                list(settings.POST_IMAGE_WIDTHS),
+            )
+            for width, name in source['files']:
+                with default_storage.open(name) as file_:
+                    data = file_.read()
+                self.assertEqual(
+                    name, images.content_name(data, name.rsplit('.')[-1])
+                )
+                image = Image.open(BytesIO(data))
+                self.assertEqual(image.width, width)
+                self.assertNotIn('exif', image.info)
+
+    def test_small_image_is_not_upscaled_to_every_width(self):
+        """Для узкой картинки создается только самая узкая копия."""
+        manifest = json.loads(
+            images.build_variants(self.save(jpeg(size=(100, 100))))
+        )
+        for source in manifest['sources']:
+            self.assertEqual(
+                [width for width, _ in source['files']],
+                [min(settings.POST_IMAGE_WIDTHS)],
+            )
+
+    def test_same_image_is_stored_once(self):
+        """Одинаковые картинки получают одни и те же копии."""
+        data = jpeg()
+        first = images.build_variants(self.save(data))
+        second = images.build_variants(self.save(data, 'posts/copy.jpg'))
+        self.assertEqual(first, second)
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1000)
+    def test_oversized_image_is_not_decoded(self):
+        """Для слишком большой картинки копии не создаются."""
+        with self.assertLogs('posts.images', 'WARNING'):
+            variants = images.build_variants(self.save(jpeg()))
+        self.assertEqual(variants, '{}')
+
+    def test_picture_markup(self):
+        """Тег picture перечисляет копии в srcset."""
+        variants = images.build_variants(self.save(jpeg()))
+        html = render_to_string(
+            'posts/includes/picture.html',
+            {'picture': images.picture(variants)},
+        )
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn(' 320w, ', html)
+        self.assertIn('width="960" height="339"', html)
+
+    def test_empty_variants(self):
+        self.assertIsNone(images.picture('{}'))
+        self.assertIsNone(images.picture(''))
+
+    def test_oversized_image_is_shown_as_is(self):
+        """Без копий слишком большой картинки выводится исходный файл."""
+        name = self.save(jpeg())
+        post = Post(image=name, image_variants='{}')
+        html = render_to_string(
+            'posts/includes/post_image.html', {'post': post}
+        )
+        self.assertIn(f'src="{default_storage.url(name)}"', html)
+
+
+class PostFormImageTests(TestCase):
+    def form(self, data):
+        return PostForm(
+            data={'text': 'Пост с фото'},
+            files={'image': SimpleUploadedFile('photo.jpg', data,
+                                               'image/jpeg')},
+        )
+
+    def test_exif_is_removed(self):
+        """Из загруженной картинки удаляется EXIF."""
+        form = self.form(jpeg())
+        self.assertTrue(form.is_valid())
+        image = Image.open(form.cleaned_data['image'])
+        self.assertNotIn('exif', image.info)
+        self.assertEqual(image.size, (1200, 800))
+
+    def test_orientation_is_applied(self):
+        """Повернутая по EXIF картинка поворачивается при сохранении."""
+        form = self.form(jpeg(orientation=6))
+        self.assertTrue(form.is_valid())
+        image = Image.open(form.cleaned_data['image'])
+        self.assertEqual(image.size, (800, 1200))
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1000)
+    def test_oversized_image_is_rejected(self):
+        """Форма не принимает картинки больше POST_IMAGE_MAX_PIXELS."""
+        form = self.form(jpeg())
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
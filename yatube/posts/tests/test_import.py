@@ -0,0 +1,158 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import AuthorStats, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+OLD_DATE = datetime(2015, 3, 1, 12, 30, tzinfo=dt_timezone.utc)
+
+
+class ImportDataTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        cls.author = User.objects.create_user(username='migrant')
+        cls.reader = User.objects.create_user(username='local_reader')
+        # Пост, который уже есть в yatube: id выгрузки с ним совпадает
+        cls.local_post = Post.objects.create(author=cls.reader, text='Свой')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def write(self, name, lines):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file_:
+            file_.write(lines)
+        return path
+
+    def write_ndjson(self, name, records):
+        return self.write(name, ''.join(
+            json.dumps(record, ensure_ascii=False) + '\n'
+            for record in records
+        ))
+
+    def import_data(self, **files):
+        out = StringIO()
+        call_command('import_data', batch_size=2, stdout=out, **files)
+        return out.getvalue()
+
+    def test_community_is_imported(self):
+        """Группы, посты, комментарии и подписки загружаются со ссылками."""
+        groups = self.write(
+            'groups.csv', 'slug,title,description\nmigrants,Переезд,\n'
+        )
+        posts = self.write_ndjson('posts.ndjson', [
+            {'id': self.local_post.pk, 'pub_date': OLD_DATE.isoformat(),
+             'author_username': 'migrant', 'group_slug': 'migrants',
+             'text': 'Старый пост про переезд'},
+            {'id': 500, 'author_username': 'migrant', 'group_slug': None,
+             'text': 'Второй пост'},
+            {'id': 501, 'author_username': 'nobody', 'text': 'Без автора'},
+        ])
+        comments = self.write_ndjson('comments.ndjson', [
+            {'post_id': self.local_post.pk, 'created': OLD_DATE.isoformat(),
+             'author_username': 'local_reader', 'text': 'Комментарий'},
+            {'post_id': 999, 'author_username': 'migrant', 'text': 'Мимо'},
+        ])
+        follows = self.write(
+            'follows.csv',
+            'user_username,author_username\n'
+            'local_reader,migrant\nlocal_reader,migrant\nmigrant,migrant\n',
+        )
+        output = self.import_data(
+            groups=groups, posts=posts, comments=comments, follows=follows
+        )
+        self.assertIn('Post: 2, пропущено 1', output)
+        self.assertIn('Comment: 1, пропущено 1', output)
+
+        old_post = Post.objects.get(text='Старый пост про переезд')
+        self.assertNotEqual(old_post.pk, self.local_post.pk)
+        self.assertEqual(old_post.pub_date, OLD_DATE)
+        self.assertEqual(old_post.group.slug, 'migrants')
+        comment = Comment.objects.get(text='Комментарий')
+        self.assertEqual(comment.post, old_post)
+        self.assertEqual(comment.created, OLD_DATE)
+        self.assertEqual(
+            list(Follow.objects.values_list('user', 'author')),
+            [(self.reader.pk, self.author.pk)],
+        )
+
+        old_post.refresh_from_db()
+        self.assertEqual(old_post.comments_count, 1)
+        self.assertEqual(Group.objects.get(slug='migrants').posts_count, 1)
+        stats = AuthorStats.objects.get(user=self.author)
+        self.assertEqual(stats.posts_count, 2)
+        self.assertEqual(stats.followers_count, 1)
+        response = self.client.get(reverse('posts:search'), {'q': 'переезд'})
+        self.assertEqual(list(response.context['page_obj']), [old_post])
+
+    def test_comments_for_existing_posts(self):
+        """Без постов в запуске комментарии ссылаются на посты yatube."""
+        comments = self.write(
+            'comments.csv',
+            'post_id,author_username,text\n'
+            f'{self.local_post.pk},stranger,Привет\n',
+        )
+        self.import_data(comments=comments)
+        self.assertFalse(Comment.objects.exists())
+        call_command(
+            'import_data', comments=comments, create_users=True,
+            stdout=StringIO(),
+        )
+        comment = Comment.objects.get()
+        self.assertEqual(comment.post, self.local_post)
+        self.assertFalse(comment.author.has_usable_password())
+
+    def test_broken_lines_are_skipped(self):
+        """Строка не в JSON или не в UTF-8 пропускается, загрузка идет."""
+        path = os.path.join(self.directory, 'broken.ndjson')
+        with open(path, 'wb') as file_:
+            file_.write(
+                b'{"author_username": "migrant", "text": "\xd0\x9f\xd0\xb5'
+                b'\xd1\x80\xd0\xb2\xd1\x8b\xd0\xb9"}\n'
+                b'{"author_username": "migrant", "text": \n'
+                b'{"author_username": "migrant", "text": "\xff\xfe"}\n'
+                b'{"author_username": "migrant", "text": "Last"}\n'
+            )
+        output = self.import_data(posts=path)
+        self.assertIn('Post: 2, пропущено 2', output)
+        self.assertIn('Строка 2', output)
+        self.assertIn('Строка 3', output)
+        self.assertEqual(
+            set(Post.objects.filter(author=self.author)
+                .values_list('text', flat=True)),
+            {'Первый', 'Last'},
+        )
+
+    def test_broken_csv_stops_import(self):
+        path = os.path.join(self.directory, 'broken.csv')
+        with open(path, 'wb') as file_:
+            file_.write(b'slug,title\nok,Ok\nbad,\xff\n')
+        with self.assertRaisesMessage(CommandError, 'строка 3'):
+            self.import_data(groups=path)
+
+    def test_import_needs_files(self):
+        with self.assertRaises(CommandError):
+            call_command('import_data', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command(
+                'import_data', posts=self.write('posts.xml', ''),
+                stdout=StringIO(),
+            )
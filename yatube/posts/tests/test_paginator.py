@@ -1,10 +1,14 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from yatube.settings import POSTS_PER_PAGE
 
 from ..models import Group, Post
+from ..utils import NEXT, encode_cursor
 
 User = get_user_model()
 
@@ -30,6 +34,7 @@ class PaginatorViewsTest(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -65,3 +70,52 @@ class PaginatorViewsTest(TestCase):
                 self.assertEqual(Post.objects.count() %
                                  len(response.context['page_obj']),
                                  (Post.objects.count() % POSTS_PER_PAGE))
+
+    def test_index_cursor_pages(self):
+        """Курсорная навигация проходит всю ленту вперед и назад."""
+        index_url = reverse('posts:index')
+        first_page = self.client.get(index_url).context['page_obj']
+        self.assertEqual(len(first_page), POSTS_PER_PAGE)
+        self.assertFalse(first_page.has_previous())
+        second_page = self.client.get(
+            index_url, {'cursor': first_page.paginator.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(
+            len(second_page), Post.objects.count() - POSTS_PER_PAGE
+        )
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(
+            set(first_page.object_list).isdisjoint(second_page.object_list)
+        )
+        previous_page = self.client.get(
+            index_url, {'cursor': second_page.paginator.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(
+            list(previous_page.object_list), list(first_page.object_list)
+        )
+        self.assertFalse(previous_page.has_previous())
+
+    def test_index_cursor_page_does_not_count(self):
+        """Курсорная страница не выполняет COUNT(*)."""
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse('posts:index'))
+        for query in context.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+
+    def test_index_broken_cursor_returns_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.client.get(reverse('posts:index') + '?cursor=xyz')
+        self.assertEqual(len(response.context['page_obj']), POSTS_PER_PAGE)
+
+    def test_index_forged_cursor_returns_first_page(self):
+        """Курсор с чужими значениями ключа открывает первую страницу."""
+        for values in (['garbage', 'y'], [None, None], [[1], {'a': 1}]):
+            with self.subTest(values=values):
+                response = self.client.get(
+                    reverse('posts:index'),
+                    {'cursor': encode_cursor(NEXT, values)},
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    len(response.context['page_obj']), POSTS_PER_PAGE
+                )
@@ -0,0 +1,76 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from .. import query_plans
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'seed_data', users=10, groups=2, posts=40, comments=20,
+            follows=15, images=0, batch_size=25, stdout=StringIO(),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_full_scan_detection(self):
+        self.assertEqual(
+            query_plans.full_scan('SCAN posts_post'), 'posts_post'
+        )
+        self.assertEqual(
+            query_plans.full_scan('SCAN TABLE posts_post'), 'posts_post'
+        )
+        for detail in (
+            'SCAN posts_post USING INDEX post_date_idx',
+            'SCAN posts_post_fts VIRTUAL TABLE INDEX 0:M1',
+            'SEARCH posts_post USING INTEGER PRIMARY KEY (rowid=?)',
+        ):
+            self.assertIsNone(query_plans.full_scan(detail))
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент и страницы поста читают таблицы по индексам."""
+        results = query_plans.check(
+            ['index', 'group_list', 'profile', 'post_detail', 'follow_index']
+        )
+        self.assertEqual(len(results), 5)
+        for name, result in results.items():
+            for query in result['queries']:
+                with self.subTest(scenario=name, sql=query['sql']):
+                    self.assertEqual(query['full_scans'], [])
+
+    def test_post_comments_use_index(self):
+        plans = query_plans.check(['post_detail'])['post_detail']['queries']
+        self.assertIn(
+            'comment_post_created_idx',
+            ' '.join(line for query in plans for line in query['plan']),
+        )
+
+    def test_command_flags_full_scans(self):
+        """Команда отмечает полное чтение и падает с --strict."""
+        out = StringIO()
+        call_command('explain_queries', scenarios=['search'], stdout=out)
+        self.assertIn('Полное чтение: posts_group', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command(
+                'explain_queries', scenarios=['search'], strict=True,
+                stdout=StringIO(),
+            )
+        out = StringIO()
+        call_command(
+            'explain_queries', scenarios=['search'], strict=True,
+            ignored=['posts_group'], stdout=out,
+        )
+        self.assertIn('Запросов с полным чтением: 0', out.getvalue())
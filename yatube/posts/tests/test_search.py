@@ -0,0 +1,105 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from yatube.settings import POSTS_PER_PAGE
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.other_author = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(title='Кошки', slug='cats')
+        cls.cat_post = Post.objects.create(
+            author=cls.author,
+            group=cls.group,
+            text='Рыжий кот <script>спит</script> на окне',
+        )
+        cls.dog_post = Post.objects.create(
+            author=cls.other_author, text='Собака лает на почтальона'
+        )
+        Comment.objects.create(
+            post=cls.dog_post, author=cls.author, text='А мой кот молчит'
+        )
+
+    def search(self, **params):
+        response = self.client.get(reverse('posts:search'), params)
+        return response, list(response.context['page_obj'] or [])
+
+    def test_search_posts_and_comments(self):
+        """Поиск находит посты по тексту поста и комментариев."""
+        response, posts = self.search(q='кот')
+        self.assertCountEqual(posts, [self.cat_post, self.dog_post])
+        self.assertContains(response, '<mark>кот</mark>')
+        self.assertNotContains(response, '<script>')
+
+    def test_search_filters(self):
+        """Результаты поиска фильтруются по группе и автору."""
+        self.assertEqual(
+            self.search(q='кот', group=self.group.slug)[1], [self.cat_post]
+        )
+        self.assertEqual(
+            self.search(q='кот', author=self.other_author.username)[1],
+            [self.dog_post],
+        )
+
+    def test_index_follows_changes(self):
+        """Изменение и удаление постов сразу видны в поиске."""
+        post = Post.objects.create(author=self.author, text='Попугай')
+        self.assertEqual(self.search(q='попуг')[1], [post])
+        post.text = 'Канарейка'
+        post.save()
+        self.assertEqual(self.search(q='попуг')[1], [])
+        post.delete()
+        self.assertEqual(self.search(q='канарейка')[1], [])
+
+    def test_search_cursor_pages(self):
+        """Курсоры поиска проходят все результаты без повторов."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Хомяк номер {num}')
+            for num in range(POSTS_PER_PAGE + 2)
+        )
+        response, first_page = self.search(q='хомяк')
+        paginator = response.context['page_obj'].paginator
+        self.assertEqual(len(first_page), POSTS_PER_PAGE)
+        self.assertContains(response, 'q=%D1%85%D0%BE%D0%BC%D1%8F%D0%BA&')
+        second_page = self.search(q='хомяк', cursor=paginator.next_cursor)[1]
+        self.assertEqual(len(second_page), 2)
+        self.assertTrue(set(first_page).isdisjoint(second_page))
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты по словам."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собака'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.dog_post]
+        )
+
+    def test_missing_hits_are_skipped(self):
+        """Найденный в индексе пост, которого нет в базе, пропускается."""
+        in_bulk = QuerySet.in_bulk
+
+        def without_cat(queryset, ids):
+            posts = in_bulk(queryset, ids)
+            posts.pop(self.cat_post.pk, None)
+            return posts
+
+        with mock.patch.object(QuerySet, 'in_bulk', without_cat):
+            response, posts = self.search(q='кот')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(posts, [self.dog_post])
@@ -0,0 +1,160 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import images, thumbnails
+from ..models import ImageBlob, Post, User
+from ..storage import BLOB_RE, blob_names
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+# Тот же GIF с другим цветом
+OTHER_GIF = SMALL_GIF.replace(b'\xFF\xFF\xFF', b'\x00\x00\xFF')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, content=SMALL_GIF, name='meme.gif'):
+        return Post.objects.create(
+            author=self.user,
+            text='Мем',
+            image=SimpleUploadedFile(name, content, 'image/gif'),
+        )
+
+    def posts_count(self, name):
+        return ImageBlob.objects.get(name=name).posts_count
+
+    def test_same_image_is_stored_once(self):
+        """Одинаковые загрузки получают одно имя по хэшу содержимого."""
+        first = self.create_post()
+        second = self.create_post(name='copy.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        directory, filename = os.path.split(first.image.name)
+        self.assertTrue(directory.startswith('posts/'))
+        self.assertRegex(filename, BLOB_RE)
+        self.assertEqual(
+            os.listdir(os.path.dirname(first.image.path)), [filename]
+        )
+        self.assertEqual(self.posts_count(first.image.name), 2)
+
+    def test_references_follow_posts(self):
+        """Счетчик ссылок меняется при замене картинки и удалении поста."""
+        post = self.create_post()
+        old_name = post.image.name
+        Post.objects.filter(pk=post.pk).update(image_variants='{}')
+        post.refresh_from_db()
+        post.image = SimpleUploadedFile('new.gif', OTHER_GIF, 'image/gif')
+        post.save()
+        self.assertEqual(self.posts_count(old_name), 0)
+        self.assertEqual(self.posts_count(post.image.name), 1)
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants, '')
+        post.delete()
+        self.assertEqual(self.posts_count(post.image.name), 0)
+
+    def test_duplicate_reuses_variants(self):
+        """Для повторной картинки копии не создаются заново."""
+        first = self.create_post()
+        thumbnails.generate(first.image.name)
+        second = self.create_post(name='copy.gif')
+        with mock.patch.object(images, 'build_variants') as build_variants:
+            thumbnails.generate(second.image.name)
+        build_variants.assert_not_called()
+        second.refresh_from_db()
+        first.refresh_from_db()
+        self.assertEqual(second.image_variants, first.image_variants)
+
+    def test_recount_images(self):
+        post = self.create_post()
+        ImageBlob.objects.all().delete()
+        call_command('recount_counters', stdout=StringIO())
+        self.assertEqual(self.posts_count(post.image.name), 1)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class CollectImageGarbageTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        user = User.objects.create_user(username='collector')
+        self.kept = Post.objects.create(
+            author=user, text='Остается',
+            image=SimpleUploadedFile('kept.gif', SMALL_GIF, 'image/gif'),
+        )
+        thumbnails.generate(self.kept.image.name)
+        removed = Post.objects.create(
+            author=user, text='Удаляется',
+            image=SimpleUploadedFile('gone.gif', OTHER_GIF, 'image/gif'),
+        )
+        thumbnails.generate(removed.image.name)
+        removed.refresh_from_db()
+        self.orphan = removed.image.name
+        self.orphan_variants = images.picture(removed.image_variants)
+        removed.delete()
+        self.age(self.orphan)
+
+    def age(self, name, hours=48):
+        past = time.time() - hours * 3600
+        os.utime(default_storage.path(name), (past, past))
+
+    def collect(self, *args):
+        call_command('collect_image_garbage', *args, stdout=StringIO())
+
+    def test_unreferenced_image_is_removed(self):
+        """Картинка без постов удаляется вместе со счетчиком."""
+        self.collect()
+        self.assertFalse(default_storage.exists(self.orphan))
+        self.assertFalse(ImageBlob.objects.filter(name=self.orphan).exists())
+        self.assertTrue(default_storage.exists(self.kept.image.name))
+
+    def test_recent_and_dry_run_files_are_kept(self):
+        """Свежие файлы и прогон без удаления ничего не трогают."""
+        self.collect('--dry-run')
+        self.assertTrue(default_storage.exists(self.orphan))
+        self.age(self.orphan, hours=1)
+        self.collect()
+        self.assertTrue(default_storage.exists(self.orphan))
+
+    def test_unreferenced_variants_are_removed(self):
+        """Удаляются только копии, на которые не ссылается ни один пост."""
+        self.kept.refresh_from_db()
+        kept_variants = images.picture(self.kept.image_variants)
+        for name in blob_names(default_storage, images.VARIANTS_DIR):
+            self.age(name)
+        self.collect()
+        self.assertFalse(default_storage.exists(
+            self.orphan_variants['src'][len(settings.MEDIA_URL):]
+        ))
+        self.assertTrue(default_storage.exists(
+            kept_variants['src'][len(settings.MEDIA_URL):]
+        ))
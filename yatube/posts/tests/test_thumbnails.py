@@ -0,0 +1,148 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import tasks
+from core.models import Task
+
+from .. import thumbnails
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPregenerationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='painter')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('thumb.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_index(self):
+        """Главная страница; постановка задач перехватывается."""
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            response = self.client.get(reverse('posts:index'))
+        return response, schedule
+
+    def test_saved_post_schedules_images(self):
+        """Новый пост с картинкой сразу ставит ее в очередь."""
+        self.assertTrue(Task.objects.filter(
+            name='posts.thumbnails.generate',
+            payload__contains=self.post.image.name,
+        ).exists())
+
+    def test_page_does_not_wait_for_thumbnail(self):
+        """Пока миниатюры нет, страница выводит заглушку и не пишет в базу."""
+        with CaptureQueriesContext(connection) as queries:
+            response, schedule = self.get_index()
+        schedule.assert_not_called()
+        self.assertNotContains(response, '<img class="card-img')
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if 'core_task' in query['sql']
+        ])
+
+    def test_failed_images_are_not_queued_again(self):
+        """Сбойная задача картинки не дает ставить ее снова и снова."""
+        Task.objects.update(state=Task.FAILED)
+        thumbnails.schedule(self.post.image.name)
+        call_command('schedule_images', stdout=StringIO())
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_schedule_images_command(self):
+        """Команда ставит в очередь картинки без копий."""
+        Task.objects.all().delete()
+        call_command('schedule_images', stdout=StringIO())
+        self.assertEqual(tasks.queue_depth(), 1)
+        tasks.run_pending()
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.image_variants)
+
+    def test_scheduled_variants_are_generated_by_worker(self):
+        """Задача из очереди создает копии картинки один раз."""
+        thumbnails.schedule(self.post.image.name)
+        thumbnails.schedule(self.post.image.name)
+        self.assertEqual(tasks.queue_depth(), 1)
+        tasks.run_pending()
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.image_variants)
+        self.assertEqual(tasks.queue_depth(), 0)
+
+    def test_generated_variants_are_shown(self):
+        """Созданные в фоне копии картинки выводятся на странице."""
+        self.get_index()
+        thumbnails.generate(self.post.image.name)
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.image_variants)
+        response, schedule = self.get_index()
+        schedule.assert_not_called()
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'srcset=')
+
+    def test_thumbnail_is_shown_until_variants_are_ready(self):
+        """Пока копий нет, выводится готовая миниатюра."""
+        thumbnails.generate(self.post.image.name)
+        Post.objects.filter(pk=self.post.pk).update(image_variants='')
+        geometry_string, options = settings.POST_THUMBNAILS[0]
+        thumbnail = thumbnails.find_thumbnail(
+            self.post.image, geometry_string, **options
+        )
+        self.assertIsNotNone(thumbnail)
+        response, schedule = self.get_index()
+        schedule.assert_not_called()
+        self.assertContains(response, thumbnail.url)
+
+    def test_feed_thumbnails_are_loaded_in_one_query(self):
+        """Миниатюры карточек ленты загружаются из sorl одним запросом."""
+        for number in range(3):
+            Post.objects.create(
+                author=self.user,
+                text=f'Еще пост {number}',
+                image=SimpleUploadedFile(
+                    f'more{number}.gif', SMALL_GIF, 'image/gif'
+                ),
+            )
+        for post in Post.objects.all():
+            thumbnails.generate(post.image.name)
+        Post.objects.update(image_variants='')
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response, _ = self.get_index()
+        kvstore_queries = [
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
+        self.assertContains(response, '<img class="card-img', count=4)
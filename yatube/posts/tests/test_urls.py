@@ -1,6 +1,7 @@
 from http import HTTPStatus
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 
@@ -29,6 +30,7 @@ class PostURLTests(TestCase):
         cls.url_profile_noUserName = f'/profile/{cls.user}/'
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client(self.user)
         self.authorized_client.force_login(self.user)
 
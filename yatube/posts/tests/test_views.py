@@ -1,8 +1,13 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Post, Group, Follow
+from yatube.settings import COMMENTS_PER_PAGE
+
+from ..models import Comment, Post, Group, Follow
 
 User = get_user_model()
 
@@ -200,3 +205,118 @@ class FollowersTests(TestCase):
             reverse('posts:follow_index'))
         posts_list = response.context['page_obj']
         self.assertNotIn(post, posts_list)
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='feed_author')
+        cls.follower = User.objects.create_user(username='feed_follower')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='feed-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.follower, author=cls.author)
+        Post.objects.create(
+            author=cls.author, group=cls.group, text='Первый пост'
+        )
+
+    def setUp(self):
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            self.follower_client.get(url)
+        return len(context.captured_queries)
+
+    def test_feed_queries_do_not_depend_on_posts_count(self):
+        """Число запросов в лентах не растет вместе с числом постов."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:follow_index'),
+        ]
+        queries_before = {url: self.count_queries(url) for url in urls}
+        for num in range(9):
+            group = Group.objects.create(
+                title=f'Группа {num}', slug=f'feed-slug-{num}'
+            )
+            Post.objects.create(author=self.author, group=group, text='Пост')
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), queries_before[url])
+
+
+class PostCommentsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='viral_author')
+        cls.post = Post.objects.create(author=cls.author, text='Вирусный пост')
+        Comment.objects.bulk_create(
+            Comment(
+                post=cls.post,
+                author=User.objects.create_user(username=f'reader{num}'),
+                text=f'Комментарий {num}',
+            )
+            for num in range(COMMENTS_PER_PAGE + 5)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_page_shows_first_comments(self):
+        """На странице поста только первая порция комментариев."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        self.assertEqual(comments[0].text, 'Комментарий 0')
+        self.assertContains(response, 'data-load-more=')
+
+    def test_load_more_returns_next_comments(self):
+        """Кнопка «Показать еще» получает только следующую порцию."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        cursor = response.context['comments'].paginator.next_cursor
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk]),
+            {'cursor': cursor},
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        texts = [comment.text for comment in response.context['comments']]
+        self.assertEqual(texts, [
+            f'Комментарий {num}'
+            for num in range(COMMENTS_PER_PAGE, COMMENTS_PER_PAGE + 5)
+        ])
+        self.assertNotContains(response, 'data-load-more=')
+
+    def test_comments_of_missing_post(self):
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk + 100])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_post_page_queries_do_not_depend_on_comments(self):
+        """Число запросов страницы поста не растет с комментариями."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.author, text='Еще')
+            for _ in range(COMMENTS_PER_PAGE)
+        )
+        cache.clear()
+        with CaptureQueriesContext(connection) as after:
+            self.client.get(url)
+        self.assertEqual(
+            len(after.captured_queries), len(before.captured_queries)
+        )
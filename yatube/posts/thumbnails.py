@@ -0,0 +1,59 @@
+from django.conf import settings
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from core import kvstore
+from core.tasks import task
+
+from . import images
+from .models import Post
+from .signals import invalidate_post_feeds
+
+
+def find_thumbnail(file_, geometry_string, **options):
+    """Готовая миниатюра из хранилища sorl или None."""
+    return default.kvstore.get(
+        kvstore.thumbnail_file(file_, geometry_string, **options)
+    )
+
+
+@task(dedupe=lambda name: name)
+def generate(name):
+    storage = Post._meta.get_field('image').storage
+    posts = Post.objects.filter(image=name)
+    # Картинка могла попасть в очередь еще раз, пока задача ждала
+    if not posts.filter(image_variants='').exists():
+        return
+    # Одинаковые картинки хранятся под одним именем: копии и миниатюры
+    # другого поста с той же картинкой используются заново
+    variants = (
+        posts.exclude(image_variants='')
+        .values_list('image_variants', flat=True).first()
+    ) or images.build_variants(name, storage)
+    if variants != '{}':
+        for geometry_string, options in settings.POST_THUMBNAILS:
+            get_thumbnail(
+                ImageFile(name, storage), geometry_string, **options
+            )
+    posts.filter(image_variants='').update(image_variants=variants)
+    # В кэше лент могла остаться заглушка вместо картинки
+    for post in Post.objects.filter(image=name).only('author', 'group'):
+        invalidate_post_feeds(post)
+
+
+def schedule(name):
+    """Ставит создание всех миниатюр и копий картинки в очередь задач."""
+    generate.delay(name)
+
+
+def schedule_missing():
+    """Ставит в очередь картинки постов, у которых еще нет копий."""
+    names = (
+        Post.objects.exclude(image='').filter(image_variants='')
+        .order_by().values_list('image', flat=True).distinct()
+    )
+    count = 0
+    for name in names.iterator():
+        schedule(name)
+        count += 1
+    return count
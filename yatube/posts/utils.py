@@ -1,9 +1,139 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
+from django.db.models import Q
 
 from yatube.settings import POSTS_PER_PAGE
 
+NEXT = 'n'
+PREVIOUS = 'p'
 
-def pagination(request, selector, count=POSTS_PER_PAGE):
-    paginator = Paginator(selector, count)
+
+def encode_cursor(direction, values):
+    data = json.dumps([direction, values], default=str)
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """Возвращает (направление, значения ключа) или (NEXT, None)."""
+    if not cursor:
+        return NEXT, None
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        direction, values = json.loads(
+            base64.urlsafe_b64decode(cursor + padding)
+        )
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError):
+        return NEXT, None
+    if (
+        direction not in (NEXT, PREVIOUS)
+        or not isinstance(values, list)
+        or len(values) != size
+    ):
+        return NEXT, None
+    return direction, values
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу без COUNT(*) и OFFSET.
+
+    Записи упорядочены по убыванию полей ``keys`` (при ``descending=False``
+    по возрастанию), последнее поле должно быть уникальным. Страница
+    выбирается условием по значениям ключа крайней записи предыдущей
+    страницы, поэтому стоимость любой страницы одинакова. Страница
+    остается обычным ``Page``: ее номер и число страниц описывают только
+    соседей, а ссылки на них лежат в ``next_cursor`` и ``previous_cursor``
+    пагинатора.
+    """
+
+    is_keyset = True
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id'),
+                 descending=True):
+        super().__init__(object_list, per_page)
+        self.keys = keys
+        self.descending = descending
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    @property
+    def num_pages(self):
+        return 1 + bool(self.previous_cursor) + bool(self.next_cursor)
+
+    def cursor_for(self, direction, obj):
+        return encode_cursor(
+            direction, [getattr(obj, key) for key in self.keys]
+        )
+
+    def key_field(self, key):
+        query = self.object_list.query
+        if key in query.annotations:
+            return query.annotations[key].output_field
+        return self.object_list.model._meta.get_field(key)
+
+    def parse(self, values):
+        """Значения курсора в типах полей ключа или None, если они чужие."""
+        try:
+            values = [
+                self.key_field(key).to_python(value)
+                for key, value in zip(self.keys, values)
+            ]
+        except (ValidationError, ValueError, TypeError):
+            return None
+        return None if None in values else values
+
+    def _seek(self, values, lookup):
+        condition = Q()
+        for position, key in enumerate(self.keys):
+            step = Q(**{f'{key}__{lookup}': values[position]})
+            for previous_key, value in zip(self.keys, values[:position]):
+                step &= Q(**{previous_key: value})
+            condition |= step
+        return condition
+
+    def fetch(self, direction, values, limit):
+        """Записи за курсором по порядку удаления от него."""
+        queryset = self.object_list
+        # Назад по убывающему списку - то же, что вперед по возрастающему
+        downward = (direction == NEXT) == self.descending
+        lookup, prefix = ('lt', '-') if downward else ('gt', '')
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, lookup))
+        queryset = queryset.order_by(
+            *(f'{prefix}{key}' for key in self.keys)
+        )
+        return list(queryset[:limit])
+
+    def get_page(self, cursor=None):
+        direction, values = decode_cursor(cursor, len(self.keys))
+        if values is not None:
+            values = self.parse(values)
+            # Подделанный курсор открывает первую страницу, как и битый
+            if values is None:
+                direction = NEXT
+        items = self.fetch(direction, values, self.per_page + 1)
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if direction == PREVIOUS:
+            items.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+        if items and has_next:
+            self.next_cursor = self.cursor_for(NEXT, items[-1])
+        if items and has_previous:
+            self.previous_cursor = self.cursor_for(PREVIOUS, items[0])
+        return self._get_page(items, 1 + bool(self.previous_cursor), self)
+
+
+def pagination(request, selector, count=POSTS_PER_PAGE, keyset=False,
+               keys=('pub_date', 'id')):
     page_number = request.GET.get('page')
+    if keyset and page_number is None:
+        paginator = CursorPaginator(selector, count, keys)
+        return paginator.get_page(request.GET.get('cursor'))
+    paginator = Paginator(selector, count)
     return paginator.get_page(page_number)
@@ -1,65 +1,127 @@
 from django.shortcuts import get_object_or_404, render, redirect
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-
-from .forms import PostForm, CommentForm
-from .models import Group, Post, Follow
-from .utils import pagination
+from django.db import transaction
+from django.http import (
+    Http404, HttpResponseBadRequest, StreamingHttpResponse,
+)
+
+from yatube.settings import COMMENTS_PER_PAGE, POSTS_PER_PAGE
+
+from . import export
+from .caching import depend_on, depend_on_many, feed_cache_context
+from .counters import author_stats
+from .feeds import follow_feed, popular_authors
+from .forms import CommentForm, ExportForm, PostForm, SearchForm
+from .models import Comment, Group, Post, Follow
+from .search import SearchPaginator
+from .utils import CursorPaginator, pagination
 
 User = get_user_model()
 
 
 def index(request):
-    posts = Post.objects.all()
-    page_obj = pagination(request, posts)
-
+    posts = Post.objects.feed()
     context = {
-        'page_obj': page_obj,
         'title': 'Главная страница Yatube',
-        'index': True
+        'index': True,
+        **feed_cache_context(
+            request, lambda: pagination(request, posts, keyset=True),
+            'index',
+        ),
     }
     return render(request, 'posts/index.html', context)
 
 
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = pagination(request, posts)
+    posts = group.posts.feed()
     title = group.title
     context = {
-        'page_obj': page_obj,
         'group': group,
-        'title': title
+        'title': title,
+        **feed_cache_context(
+            request, lambda: pagination(request, posts), 'group', group.pk
+        ),
     }
     return render(request, 'posts/group_list.html', context)
 
 
 def profile(request, username):
     user = request.user
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    posts_count = author.posts.count
-    page_obj = pagination(request, posts)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    depend_on(request, 'stats', author.pk)
+    stats = author_stats(author)
+    posts = author.posts.feed()
     following = user.is_authenticated and Follow.objects.filter(
         user=request.user, author=author).exists()
     context = {
         'author': author,
-        'page_obj': page_obj,
-        'posts_count': posts_count,
+        'posts_count': stats.posts_count,
+        'stats': stats,
         'following': following,
+        **feed_cache_context(
+            request, lambda: pagination(request, posts, keyset=True),
+            'profile', author.pk,
+        ),
     }
     return render(request, 'posts/profile.html', context)
 
 
+def search(request):
+    form = SearchForm(request.GET or None)
+    page_obj = None
+    if form.is_valid() and form.cleaned_data['q']:
+        paginator = SearchPaginator(
+            form.cleaned_data['q'],
+            POSTS_PER_PAGE,
+            group=form.cleaned_data['group'],
+            author=form.cleaned_data['author'],
+        )
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+    page_query = request.GET.copy()
+    page_query.pop('cursor', None)
+    context = {
+        'form': form,
+        'page_obj': page_obj,
+        'page_query': page_query.urlencode(),
+        'title': 'Поиск',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def comment_page(request, post_id, cursor):
+    """Порция комментариев поста по курсору, от старых к новым."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).only('post_id', 'text', 'created', 'author__username').order_by(
+        'created', 'id'
+    )
+    paginator = CursorPaginator(
+        comments, COMMENTS_PER_PAGE, ('created', 'id'), descending=False
+    )
+    page = paginator.get_page(cursor)
+    depend_on_many(
+        request, 'author', {comment.author_id for comment in page}
+    )
+    return page
+
+
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    author = post.author
-    posts_count = author.posts.count
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id
+    )
+    depend_on(request, 'post', post.pk)
+    depend_on(request, 'profile', post.author_id)
+    stats = author_stats(post.author)
     title = f'Пост {post.text[:30]}'
     comment_form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    comments = comment_page(request, post.pk, request.GET.get('comments'))
     context = {
-        'posts_count': posts_count,
+        'posts_count': stats.posts_count,
         'post': post,
         'title': title,
         'comment_form': comment_form,
@@ -68,9 +130,23 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    """Следующая порция комментариев для кнопки «Показать еще»."""
+    depend_on(request, 'post', post_id)
+    comments = comment_page(request, post_id, request.GET.get('cursor'))
+    if not comments and not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    context = {
+        'post_id': post_id,
+        'comments': comments,
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     context = {'form': form}
     if form.is_valid():
         post = form.save(commit=False)
@@ -82,6 +158,7 @@ def post_create(request):
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     if post.author != request.user:
@@ -93,7 +170,8 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        # Счетчики поста меняются отдельно, их не перезаписываем
+        form.instance.save(update_fields=form.Meta.fields)
         return redirect('posts:post_detail', post_id=post_id)
     context = {
         'post': post,
@@ -104,6 +182,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -117,17 +196,20 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(
-        author__following__user=request.user
-    )
+    depend_on(request, 'stats', request.user.pk)
+    depend_on(request, 'follow_feed', request.user.pk)
+    popular = list(popular_authors(request.user))
+    depend_on_many(request, 'profile', popular)
+    post_list, keys = follow_feed(request.user, popular)
     context = {
-        'page_obj': pagination(request, post_list),
+        'page_obj': pagination(request, post_list, keyset=True, keys=keys),
         'follow': True
     }
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
@@ -139,6 +221,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     follow_obj = Follow.objects.filter(
@@ -147,3 +230,22 @@ def profile_unfollow(request, username):
     if request.user != author and follow_obj.exists():
         follow_obj.delete()
     return redirect('posts:profile', username)
+
+
+@staff_member_required
+def export_data(request, dataset):
+    """Выгрузка таблицы потоком NDJSON или CSV для сотрудников."""
+    if dataset not in export.DATASETS:
+        raise Http404
+    form = ExportForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.error_text())
+    file_format = form.cleaned_data['format'] or 'ndjson'
+    response = StreamingHttpResponse(
+        export.lines(dataset, file_format, **form.filters()),
+        content_type=f'{export.FORMATS[file_format]}; charset=utf-8',
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{dataset}.{file_format}"'
+    )
+    return response
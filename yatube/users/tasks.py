@@ -0,0 +1,36 @@
+from django.contrib.auth.forms import PasswordResetForm
+from django.contrib.auth.tokens import default_token_generator
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from core.tasks import task
+
+
+@task(lane='high')
+def send_password_reset(email, domain, site_name, use_https,
+                        subject_template_name, email_template_name,
+                        from_email=None, html_email_template_name=None,
+                        extra_email_context=None):
+    """Отправляет письма сброса пароля из исполнителя очереди.
+
+    В очереди хранится только адрес и сайт: пользователи, токен и
+    текст письма появляются здесь, поэтому ссылка для сброса не
+    сохраняется в базе.
+    """
+    form = PasswordResetForm()
+    for user in form.get_users(email):
+        context = {
+            'email': email,
+            'domain': domain,
+            'site_name': site_name,
+            'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+            'user': user,
+            'token': default_token_generator.make_token(user),
+            'protocol': 'https' if use_https else 'http',
+            **(extra_email_context or {}),
+        }
+        form.send_mail(
+            subject_template_name, email_template_name, context,
+            from_email, email,
+            html_email_template_name=html_email_template_name,
+        )
@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test import TestCase
+from django.urls import reverse
+
+from core import tasks
+from core.models import Task
+
+User = get_user_model()
+
+
+class PasswordResetTests(TestCase):
+    def test_reset_email_is_sent_by_worker(self):
+        """Письмо для сброса пароля отправляет исполнитель очереди."""
+        User.objects.create_user(
+            username='forgetful', email='forgetful@example.com',
+            password='old-password',
+        )
+        response = self.client.post(
+            reverse('users:password_reset'),
+            {'email': 'forgetful@example.com'},
+        )
+        self.assertRedirects(response, reverse('users:password_reset_done'))
+        self.assertEqual(mail.outbox, [])
+        tasks.run_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['forgetful@example.com'])
+        self.assertIn('/auth/reset/', mail.outbox[0].body)
+
+    def test_reset_token_is_not_queued(self):
+        """В очереди лежит адрес, но не ссылка с токеном."""
+        User.objects.create_user(
+            username='forgetful', email='forgetful@example.com',
+            password='old-password',
+        )
+        self.client.post(
+            reverse('users:password_reset'),
+            {'email': 'forgetful@example.com'},
+        )
+        payload = Task.objects.get().payload
+        self.assertIn('forgetful@example.com', payload)
+        self.assertNotIn('/auth/reset/', payload)
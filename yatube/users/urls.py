@@ -6,6 +6,7 @@ from django.contrib.auth.views import (
 from django.urls import path
 
 from . import views
+from .forms import QueuedPasswordResetForm
 
 app_name = 'users'
 
@@ -37,7 +38,10 @@ urlpatterns = [
 
     path(
         'password_reset/',
-        PasswordResetView.as_view(template_name=temp_p_r_form),
+        PasswordResetView.as_view(
+            template_name=temp_p_r_form,
+            form_class=QueuedPasswordResetForm,
+        ),
         name='password_reset'
     ),
 
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import subprocess
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -50,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,6 +59,9 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ConditionalPageMiddleware',
+    'core.middleware.AnonymousPageCacheMiddleware',
+    'core.middleware.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -91,6 +96,36 @@ DATABASES = {
     }
 }
 
+# Реплики основной базы только для чтения. Страницы из REPLICA_VIEWS
+# читают из случайной доступной реплики; доступность проверяется раз в
+# REPLICA_HEALTH_INTERVAL секунд. После запроса, который что-то записал,
+# клиент REPLICA_STICKY_SECONDS секунд читает из основной базы. Фрагменты
+# лент при промахе кэша строятся из основной базы, а страницы из реплики
+# не попадают в кэш страниц и не получают ETag.
+# Для проверки без сервера базы SQLITE_REPLICAS задает число копий
+# db.sqlite3 (db.replica1.sqlite3 и т. д.), их обновляет sync_replicas.
+SQLITE_REPLICAS = 0
+for number in range(1, SQLITE_REPLICAS + 1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.replica{number}.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+REPLICA_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:post_comments',
+    'posts:follow_index',
+    'posts:search',
+)
+REPLICA_STICKY_SECONDS = 10
+REPLICA_STICKY_COOKIE = 'read_primary'
+REPLICA_HEALTH_INTERVAL = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -144,14 +179,163 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 EMPTY_VALUE_DISPLAY = '-пусто-'
 
 POSTS_PER_PAGE = 10
+# Сколько комментариев выводить под постом и подгружать за раз
+COMMENTS_PER_PAGE = 20
+
+# Сколько строк выгрузки export_data читать одним запросом
+EXPORT_CHUNK_SIZE = 2000
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+
+def _release():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+# Версия кода: переменная окружения YATUBE_RELEASE или ревизия git
+RELEASE = os.environ.get('YATUBE_RELEASE') or _release()
+
+# Кэш в файле SQLite общий для всех процессов WSGI-сервера на узле,
+# в нем же хранятся сессии. Ключи начинаются с RELEASE: после выкладки
+# фрагменты и страницы, собранные старым кодом, больше не читаются и
+# вытесняются по сроку
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'default.sqlite3'),
+        'KEY_PREFIX': RELEASE,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
     }
 }
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+# Тесты получают свой файл кэша и не очищают кэш разработчика
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+# Готовые страницы лент и постов для анонимных читателей; сбрасываются
+# сигналами при изменении данных, время жизни ограничивает устаревание
+# остального (например, года в подвале). 0 выключает кэш страниц.
+PAGE_CACHE_TIMEOUT = 60 * 10
+# Сколько помнить версии данных страницы для ответов 304 на запросы с
+# If-None-Match. 0 выключает условные запросы.
+PAGE_VERSIONS_TIMEOUT = 60 * 60 * 24
+
+# Защита от одновременного пересчета (core.caching.get_or_compute):
+# значение отдается еще CACHE_STALE_TIMEOUT секунд после срока, пока его
+# пересчитывает один запрос под блокировкой. Чем больше
+# CACHE_EARLY_RECOMPUTE_BETA, тем раньше срока начинается пересчет.
+CACHE_STALE_TIMEOUT = 60 * 5
+CACHE_LOCK_TIMEOUT = 30
+CACHE_LOCK_WAIT = 2
+CACHE_EARLY_RECOMPUTE_BETA = 1
+
+# Фрагменты лент сбрасываются сигналами при изменении постов, групп
+# и авторов, поэтому время жизни может быть большим
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Материализованная лента подписок: посты раскладываются по лентам
+# подписчиков при публикации. Посты авторов, у которых подписчиков больше
+# FOLLOW_FEED_FANOUT_LIMIT, не раскладываются и читаются при запросе.
+FOLLOW_FEED_MATERIALIZED = False
+FOLLOW_FEED_FANOUT_LIMIT = 10000
+FOLLOW_FEED_BACKFILL_SIZE = 1000
+FOLLOW_FEED_BATCH_SIZE = 1000
+
+# Очередь задач в базе (core.tasks): миниатюры, письма, ленты подписок.
+# Задачи выполняет команда run_tasks в TASK_WORKER_PROCESSES процессах,
+# ее нужно запускать рядом с сайтом. При TASK_WORKER_THREAD задачи
+# выполняет и поток в каждом процессе сайта - удобно для разработки без
+# run_tasks, но поток делит базу с запросами, поэтому он выключен.
+# Полосы TASK_LANES перечислены от самой срочной. Неудачная задача
+# повторяется через TASK_RETRY_DELAY секунд, пауза удваивается с каждой
+# попыткой. Задача, не завершенная за TASK_LEASE секунд, выполняется снова.
+TASK_WORKER_THREAD = False
+TASK_WORKER_PROCESSES = 2
+TASK_LANES = ('high', 'default', 'low')
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_DELAY = 10
+TASK_RETRY_MAX_DELAY = 60 * 60
+TASK_LEASE = 60 * 10
+TASK_POLL_INTERVAL = 1
+
+# Миниатюры картинок постов, которые создаются в фоне после загрузки.
+# Размеры должны совпадать с размерами в шаблонах.
+POST_THUMBNAILS = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+# Записи о миниатюрах хранятся в общем кэше и таблице sorl, карточки
+# ленты загружают их пачкой
+THUMBNAIL_KVSTORE = 'core.kvstore.KVStore'
+
+# Копии картинок постов для srcset: ширины в WebP и исходном формате
+# с пропорциями POST_IMAGE_SIZE. Картинки больше POST_IMAGE_MAX_PIXELS
+# форма не принимает, а Pillow отказывается их раскодировать.
+POST_IMAGE_SIZE = (960, 339)
+POST_IMAGE_WIDTHS = (320, 640, 960)
+POST_IMAGE_SIZES = '(max-width: 960px) 100vw, 960px'
+POST_IMAGE_MAX_PIXELS = 50_000_000
+
+# Замеры запросов: время, SQL, шаблоны, кэш и миниатюры пишутся в журнал
+# yatube.performance, а при PERFORMANCE_SERVER_TIMING - в заголовок
+# Server-Timing. Выключенные замеры ничего не стоят.
+PERFORMANCE_INSTRUMENTATION = False
+PERFORMANCE_SERVER_TIMING = False
+
+# Бюджеты страниц по имени маршрута: сколько SQL-запросов допускается
+# при пустом кэше и сколько миллисекунд на ответ. Число запросов
+# проверяют тесты, а при DEBUG и QUERY_BUDGET_MODE ('log' или 'raise')
+# бюджеты проверяет PerformanceMiddleware.
+QUERY_BUDGETS = {
+    'posts:index': {'queries': 4, 'ms': 200},
+    'posts:group_list': {'queries': 5, 'ms': 200},
+    'posts:profile': {'queries': 5, 'ms': 200},
+    'posts:post_detail': {'queries': 4, 'ms': 200},
+    'posts:post_comments': {'queries': 3, 'ms': 100},
+    'posts:export_data': {'queries': 2, 'ms': 100},
+    'posts:follow_index': {'queries': 4, 'ms': 200},
+    'posts:search': {'queries': 5, 'ms': 300},
+    'posts:post_create': {'queries': 5, 'ms': 200},
+    'posts:post_edit': {'queries': 7, 'ms': 200},
+    'posts:add_comment': {'queries': 8, 'ms': 200},
+    'posts:profile_follow': {'queries': 11, 'ms': 200},
+    'posts:profile_unfollow': {'queries': 10, 'ms': 200},
+    'about:author': {'queries': 2, 'ms': 100},
+    'about:tech': {'queries': 2, 'ms': 100},
+}
+QUERY_BUDGET_MODE = None
+
+# Метрики в формате Prometheus на странице /metrics/. Каждый процесс
+# WSGI-сервера сбрасывает свои метрики в METRICS_DIR не чаще раза в
+# METRICS_FLUSH_INTERVAL секунд, страница складывает файлы всех процессов.
+# Каталог стоит очищать при перезапуске сервера.
+METRICS_ENABLED = False
+METRICS_DIR = os.path.join(BASE_DIR, 'metrics')
+METRICS_FLUSH_INTERVAL = 1
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'yatube.performance': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}